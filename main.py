@@ -41,6 +41,9 @@ class IrrigationMonitoringSystem:
         job_interval = int(os.getenv('IRRIGATION_JOB_INTERVAL_MINUTES', '30'))
         ml_model_url = os.getenv('ML_MODEL_URL', None)
         use_mock_model = os.getenv('USE_MOCK_ML_MODEL', 'true').lower() == 'true'
+        granular_events = os.getenv('IRRIGATION_GRANULAR_EVENTS', 'true').lower() == 'true'
+        ml_backend = os.getenv('ML_MODEL_BACKEND', 'http')
+        ml_model_path = os.getenv('ML_MODEL_PATH', None)
         
         
         # Initialize database
@@ -52,10 +55,11 @@ class IrrigationMonitoringSystem:
         self.soil_analyzer = SoilAnalyzer(self.soil_config, self.db_manager)
         self.npk_analyzer = NPKAnalyzer('config/npk_config.yaml', self.db_manager)
         
-        # Initialize MQTT client
+        # Initialize MQTT client (messages are handled on its consumer thread)
         self.mqtt_client = MQTTClient(
             config_path='config/mqtt_config.yaml',
-            db_manager=self.db_manager
+            db_manager=self.db_manager,
+            on_message_callback=self._custom_on_message
         )
         
         # Initialize irrigation controller
@@ -73,7 +77,10 @@ class IrrigationMonitoringSystem:
             mqtt_client=None,
             ml_model_url=ml_model_url,
             interval_minutes=job_interval,
-            use_mock_model=use_mock_model
+            use_mock_model=use_mock_model,
+            granular_events=granular_events,
+            ml_backend=ml_backend,
+            ml_model_path=ml_model_path
     )
         
         # NPK tracking per zone
@@ -92,9 +99,6 @@ class IrrigationMonitoringSystem:
             'other': 0
         }
         
-        # Override on_message
-        self.mqtt_client.on_message = self._custom_on_message
-        
     def load_configs(self):
         """Load YAML configuration files"""
         try:
@@ -119,12 +123,14 @@ class IrrigationMonitoringSystem:
         """Custom message handler for ALL sensor types - displays everything"""
         try:
             topic = msg.topic
-            payload = json.loads(msg.payload.decode())
+            payload = json.loads(msg.payload)
             
             # Parse timestamp
             timestamp_str = payload.get('timestamp')
             if timestamp_str:
-                timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                timestamp = datetime.fromisoformat(
+                    timestamp_str[:-1] + '+00:00' if timestamp_str.endswith('Z') else timestamp_str
+                )
             else:
                 timestamp = datetime.now(timezone.utc)
             
@@ -138,19 +144,19 @@ class IrrigationMonitoringSystem:
             if 'npk/nitrogen' in topic:
                 self.sensor_stats['npk_nitrogen'] += 1
                 logger.info(f"🌿 [NPK-N] Zone: {zone_id} | Nitrogen: {value} {unit} | Depth: {payload.get('depth_cm', 'N/A')}cm | Sensor: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 self._handle_npk_reading(zone_id, 'nitrogen', value, timestamp, payload)
                 
             elif 'npk/phosphorus' in topic:
                 self.sensor_stats['npk_phosphorus'] += 1
                 logger.info(f"🌿 [NPK-P] Zone: {zone_id} | Phosphorus: {value} {unit} | Depth: {payload.get('depth_cm', 'N/A')}cm | Sensor: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 self._handle_npk_reading(zone_id, 'phosphorus', value, timestamp, payload)
                 
             elif 'npk/potassium' in topic:
                 self.sensor_stats['npk_potassium'] += 1
                 logger.info(f"🌿 [NPK-K] Zone: {zone_id} | Potassium: {value} {unit} | Depth: {payload.get('depth_cm', 'N/A')}cm | Sensor: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 self._handle_npk_reading(zone_id, 'potassium', value, timestamp, payload)
             
             # ==================== WATER LEVEL SENSOR ====================
@@ -164,7 +170,7 @@ class IrrigationMonitoringSystem:
                 
                 logger.info(f"💧 [WATER] Level: {level_percent}% | Current: {current_liters}L | Capacity: {capacity_liters}L | Height: {water_height}cm | Status: {tank_status}")
                 logger.debug(f"   └─ Sensor: {sensor_id} | Type: {payload.get('sensor_type', 'N/A')}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 self._handle_water_level(payload, timestamp)
             
             # ==================== SOIL MOISTURE SENSOR ====================
@@ -172,15 +178,11 @@ class IrrigationMonitoringSystem:
                 self.sensor_stats['moisture'] += 1
                 depth_cm = payload.get('depth_cm', 'N/A')
                 logger.info(f"💦 [MOISTURE] Zone: {zone_id} | Moisture: {value}{unit} | Depth: {depth_cm}cm | Sensor: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 
-                self.db_manager.store_sensor_reading(
-                    timestamp=timestamp,
-                    zone_id=zone_id,
-                    sensor_type='moisture',
-                    value=value,
-                    unit=unit,
-                    depth_cm=payload.get('depth_cm')
+                self.mqtt_client.buffer_reading(
+                    timestamp, zone_id, 'moisture',
+                    value, unit, payload.get('depth_cm')
                 )
                 self.analyze_and_act(payload, timestamp)
             
@@ -199,15 +201,11 @@ class IrrigationMonitoringSystem:
                     logger.info(f"🌡️  [TEMP] Zone: {zone_id} | Temperature: {value}{unit} | Depth: {depth_cm}cm")
                 
                 logger.debug(f"   └─ Sensor: {sensor_id} | Type: {sensor_type} | ROM: {rom_code}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 
-                self.db_manager.store_sensor_reading(
-                    timestamp=timestamp,
-                    zone_id=zone_id,
-                    sensor_type='temperature',
-                    value=value,
-                    unit=unit,
-                    depth_cm=payload.get('depth_cm')
+                self.mqtt_client.buffer_reading(
+                    timestamp, zone_id, 'temperature',
+                    value, unit, payload.get('depth_cm')
                 )
             
             # ==================== HUMIDITY SENSOR ====================
@@ -222,7 +220,7 @@ class IrrigationMonitoringSystem:
                 logger.info(f"🌫️  [HUMIDITY] Zone: {zone_id} | Humidity: {humidity}% RH | Air Temp: {temperature}°C")
                 logger.info(f"   └─ Heat Index: {heat_index}°C | Dew Point: {dew_point}°C | Sensor Type: {sensor_type}")
                 logger.debug(f"   └─ Sensor ID: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 
                 self._handle_humidity(payload, timestamp)
             
@@ -230,15 +228,11 @@ class IrrigationMonitoringSystem:
             elif 'rainfall' in topic:
                 self.sensor_stats['rainfall'] += 1
                 logger.info(f"🌧️  [RAINFALL] Zone: {zone_id} | Rainfall: {value}{unit} | Sensor: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 
-                self.db_manager.store_sensor_reading(
-                    timestamp=timestamp,
-                    zone_id=zone_id,
-                    sensor_type='rainfall',
-                    value=value,
-                    unit=unit,
-                    depth_cm=None
+                self.mqtt_client.buffer_reading(
+                    timestamp, zone_id, 'rainfall',
+                    value, unit, None
                 )
             
             # ==================== UNKNOWN/OTHER SENSORS ====================
@@ -247,17 +241,13 @@ class IrrigationMonitoringSystem:
                 sensor_type = topic.split('/')[-1]
                 logger.info(f"📡 [UNKNOWN] Topic: {topic} | Zone: {zone_id} | Value: {value}{unit}")
                 logger.info(f"   └─ Sensor Type: {sensor_type} | Sensor ID: {sensor_id}")
-                logger.debug(f"   └─ Full payload: {json.dumps(payload, indent=2)}")
+                logger.opt(lazy=True).debug("   └─ Full payload: {}", lambda: json.dumps(payload, indent=2))
                 
                 # Try to store generically
                 try:
-                    self.db_manager.store_sensor_reading(
-                        timestamp=timestamp,
-                        zone_id=zone_id if zone_id != 'N/A' else 'unknown',
-                        sensor_type=sensor_type,
-                        value=value if value is not None else 0,
-                        unit=unit,
-                        depth_cm=payload.get('depth_cm')
+                    self.mqtt_client.buffer_reading(
+                        timestamp, zone_id if zone_id != 'N/A' else 'unknown', sensor_type,
+                        value if value is not None else 0, unit, payload.get('depth_cm')
                     )
                 except Exception as e:
                     logger.warning(f"   └─ Could not store unknown sensor data: {e}")
@@ -556,6 +546,7 @@ class IrrigationMonitoringSystem:
             self._display_statistics()
             self.irrigation_job.stop()
             self.mqtt_client.stop()
+            self.db_manager.close()
             logger.info("👋 Goodbye!")
 
 
@@ -0,0 +1,31 @@
+"""
+Export the trained XGBoost pump model to ONNX for the in-process client backend
+(PumpModelClient(backend='onnx')). Requires onnxmltools.
+
+Usage: python export_onnx.py [xgb_pump_model.pkl] [pump_model.onnx]
+"""
+
+import sys
+import joblib
+from onnxmltools import convert_xgboost
+from onnxmltools.convert.common.data_types import FloatTensorType
+
+# Temperature, Humidity, water_level, N, P, K
+N_FEATURES = 6
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'xgb_pump_model.pkl'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else 'pump_model.onnx'
+
+    model = joblib.load(model_path)
+    onnx_model = convert_xgboost(model, initial_types=[('input', FloatTensorType([None, N_FEATURES]))])
+
+    with open(output_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+
+    print(f"✅ Exported {model_path} -> {output_path}")
+
+
+if __name__ == '__main__':
+    main()
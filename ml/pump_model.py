@@ -10,6 +10,8 @@ import logging
 import os
 import joblib
 
+from pump_rules import calculate_amount, generate_reason
+
 app = Flask(__name__)
 
 # Configure logging
@@ -127,12 +129,12 @@ class XGBoostPumpModel:
             confidence = abs(probability - 0.5) * 2  # Scale 0.5-1.0 to 0-1.0
             
             # Calculate recommended amount based on probability and moisture deficit
-            recommended_amount = self._calculate_amount(
+            recommended_amount = calculate_amount(
                 probability, water_level, temperature, humidity
             )
             
             # Generate reason
-            reason = self._generate_reason(
+            reason = generate_reason(
                 should_irrigate, probability, water_level, temperature, 
                 humidity, nitrogen, phosphorus, potassium
             )
@@ -165,74 +167,6 @@ class XGBoostPumpModel:
         except Exception as e:
             logger.error(f"❌ Prediction error: {e}")
             raise
-    
-    def _calculate_amount(self, probability: float, water_level: float, 
-                         temperature: float, humidity: float) -> float:
-        """
-        Calculate recommended irrigation amount based on prediction probability
-        
-        Args:
-            probability: Model prediction probability (0-1)
-            water_level: Current water/moisture level (0-100)
-            temperature: Temperature in Celsius
-            humidity: Humidity percentage
-            
-        Returns:
-            Recommended amount in mm
-        """
-        if probability <= 0.5:
-            return 0.0
-        
-        # Base amount scaled by probability
-        base_amount = 15.0
-        prob_factor = (probability - 0.5) * 2  # Scale 0.5-1.0 to 0-1.0
-        
-        # Adjust for water deficit
-        optimal_water_level = 60.0
-        deficit = max(0, optimal_water_level - water_level)
-        deficit_factor = deficit / 40  # Normalize
-        
-        # Adjust for environmental conditions
-        temp_factor = 1.0 + max(0, (temperature - 25) / 20)
-        humidity_factor = 1.0 + max(0, (60 - humidity) / 60)
-        
-        # Calculate final amount
-        amount = base_amount * prob_factor * (1 + deficit_factor) * temp_factor * humidity_factor
-        
-        # Cap at reasonable limits
-        amount = max(5.0, min(amount, 25.0))
-        
-        return amount
-    
-    def _generate_reason(self, should_irrigate: bool, probability: float,
-                        water_level: float, temperature: float, humidity: float,
-                        nitrogen: float, phosphorus: float, potassium: float) -> str:
-        """Generate human-readable explanation for the decision"""
-        
-        if should_irrigate:
-            reasons = []
-            
-            if water_level < 40:
-                reasons.append(f"Low water level ({water_level:.1f}%)")
-            
-            if temperature > 30:
-                reasons.append(f"High temperature ({temperature:.1f}°C)")
-            
-            if humidity < 40:
-                reasons.append(f"Low humidity ({humidity:.1f}%)")
-            
-            if nitrogen < 40 or phosphorus < 25 or potassium < 100:
-                reasons.append("Nutrient levels suboptimal")
-            
-            if reasons:
-                return f"XGBoost model recommends irrigation (p={probability:.3f}): {', '.join(reasons)}"
-            else:
-                return f"XGBoost model recommends preventive irrigation (p={probability:.3f})"
-        else:
-            if water_level > 60:
-                return f"Adequate water level ({water_level:.1f}%) - No irrigation needed (p={probability:.3f})"
-            else:
-                return f"Current conditions adequate - No irrigation needed (p={probability:.3f})"
 
 
 # Initialize model
@@ -326,6 +260,54 @@ def predict():
         }), 500
 
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Batch prediction endpoint
+    
+    Request Body: list of /predict request bodies
+    Response: list of /predict responses, in the same order
+    """
+    if model is None:
+        return jsonify({
+            'error': 'Model not loaded',
+            'status': 'error'
+        }), 500
+    
+    try:
+        data = request.get_json()
+        
+        if not isinstance(data, list) or not data:
+            return jsonify({
+                'error': 'Expected a non-empty JSON array',
+                'status': 'error'
+            }), 400
+        
+        logger.info(f"📥 Batch prediction request received: {len(data)} item(s)")
+        
+        received_at = datetime.utcnow().isoformat()
+        predictions = []
+        for item in data:
+            prediction = model.predict(item)
+            prediction['request'] = {
+                'zone_id': item.get('zone_id'),
+                'received_at': received_at
+            }
+            predictions.append(prediction)
+        
+        return jsonify(predictions), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Batch prediction error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'error': str(e),
+            'status': 'error',
+            'timestamp': datetime.utcnow().isoformat()
+        }), 500
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -355,6 +337,7 @@ def info():
         'feature_order': 'Temperature, Humidity, water_level, N, P, K',
         'endpoints': {
             '/predict': 'POST - Make irrigation prediction',
+            '/predict_batch': 'POST - Make irrigation predictions for a list of inputs',
             '/health': 'GET - Health check',
             '/info': 'GET - Model information',
             '/test': 'GET - Test prediction with sample data'
@@ -0,0 +1,75 @@
+"""
+Post-model irrigation rules shared by the ML service (pump_model.py) and the
+in-process ONNX backend (src/pump_model_client.py). Pure Python, no dependencies.
+"""
+
+
+def calculate_amount(probability: float, water_level: float,
+                     temperature: float, humidity: float) -> float:
+    """
+    Calculate recommended irrigation amount based on prediction probability
+
+    Args:
+        probability: Model prediction probability (0-1)
+        water_level: Current water/moisture level (0-100)
+        temperature: Temperature in Celsius
+        humidity: Humidity percentage
+
+    Returns:
+        Recommended amount in mm
+    """
+    if probability <= 0.5:
+        return 0.0
+
+    # Base amount scaled by probability
+    base_amount = 15.0
+    prob_factor = (probability - 0.5) * 2  # Scale 0.5-1.0 to 0-1.0
+
+    # Adjust for water deficit
+    optimal_water_level = 60.0
+    deficit = max(0, optimal_water_level - water_level)
+    deficit_factor = deficit / 40  # Normalize
+
+    # Adjust for environmental conditions
+    temp_factor = 1.0 + max(0, (temperature - 25) / 20)
+    humidity_factor = 1.0 + max(0, (60 - humidity) / 60)
+
+    # Calculate final amount
+    amount = base_amount * prob_factor * (1 + deficit_factor) * temp_factor * humidity_factor
+
+    # Cap at reasonable limits
+    amount = max(5.0, min(amount, 25.0))
+
+    return amount
+
+
+def generate_reason(should_irrigate: bool, probability: float,
+                    water_level: float, temperature: float, humidity: float,
+                    nitrogen: float, phosphorus: float, potassium: float,
+                    model_name: str = "XGBoost") -> str:
+    """Generate human-readable explanation for the decision"""
+
+    if should_irrigate:
+        reasons = []
+
+        if water_level < 40:
+            reasons.append(f"Low water level ({water_level:.1f}%)")
+
+        if temperature > 30:
+            reasons.append(f"High temperature ({temperature:.1f}°C)")
+
+        if humidity < 40:
+            reasons.append(f"Low humidity ({humidity:.1f}%)")
+
+        if nitrogen < 40 or phosphorus < 25 or potassium < 100:
+            reasons.append("Nutrient levels suboptimal")
+
+        if reasons:
+            return f"{model_name} model recommends irrigation (p={probability:.3f}): {', '.join(reasons)}"
+        else:
+            return f"{model_name} model recommends preventive irrigation (p={probability:.3f})"
+    else:
+        if water_level > 60:
+            return f"Adequate water level ({water_level:.1f}%) - No irrigation needed (p={probability:.3f})"
+        else:
+            return f"Current conditions adequate - No irrigation needed (p={probability:.3f})"
@@ -6,9 +6,10 @@ CREATE TABLE IF NOT EXISTS sensor_readings (
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     zone_id VARCHAR(50) NOT NULL,
     sensor_type VARCHAR(50) NOT NULL,
-    value FLOAT NOT NULL,
+    value REAL NOT NULL,
     unit VARCHAR(20),
-    depth_cm INTEGER
+    depth_cm INTEGER,
+    CONSTRAINT uq_sr UNIQUE (zone_id, timestamp, sensor_type)
 );
 
 -- Irrigation events table
@@ -16,7 +17,7 @@ CREATE TABLE IF NOT EXISTS irrigation_events (
     id SERIAL PRIMARY KEY,
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     zone_id VARCHAR(50) NOT NULL,
-    amount_mm FLOAT NOT NULL,
+    amount_mm REAL NOT NULL,
     manual BOOLEAN DEFAULT FALSE
 );
 
@@ -25,18 +26,20 @@ CREATE TABLE IF NOT EXISTS soil_analysis (
     id SERIAL PRIMARY KEY,
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     zone_id VARCHAR(50) NOT NULL,
-    moisture_pct FLOAT,
-    paw_percentage FLOAT,
-    field_capacity FLOAT,
-    wilting_point FLOAT,
+    moisture_pct REAL,
+    paw_percentage REAL,
+    field_capacity REAL,
+    wilting_point REAL,
     status VARCHAR(50),
     irrigation_needed BOOLEAN,
     predicted_days_to_threshold FLOAT,
-    current_moisture FLOAT
+    current_moisture REAL
 );
 
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_sensor_readings_zone_time ON sensor_readings(zone_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_sensor_zone_type_ts ON sensor_readings(zone_id, sensor_type, timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_sr_ts_brin ON sensor_readings USING brin (timestamp) WITH (pages_per_range = 32);
 CREATE INDEX IF NOT EXISTS idx_irrigation_events_zone_time ON irrigation_events(zone_id, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_soil_analysis_zone_time ON soil_analysis(zone_id, timestamp DESC);
 
@@ -0,0 +1,60 @@
+-- Bring an existing database up to the current sensor table constraints and indexes.
+-- create_all() / init_db.sql only apply these to freshly created tables.
+-- Idempotent: safe to run more than once.
+--
+--   docker exec -i irrigation-db psql -U irrigation_user -d irrigation_db < scripts/migrate_sensor_indexes.sql
+
+BEGIN;
+
+-- ==================== sensor_readings: uq_sr ====================
+-- Ingestion uses ON CONFLICT (zone_id, timestamp, sensor_type), which needs this constraint.
+-- Block writers between the dedupe and the constraint so no new duplicates slip in.
+LOCK TABLE sensor_readings IN SHARE ROW EXCLUSIVE MODE;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'uq_sr' AND conrelid = 'sensor_readings'::regclass
+    ) THEN
+        -- Keep the first stored copy of each redelivered reading
+        DELETE FROM sensor_readings a
+        USING sensor_readings b
+        WHERE a.zone_id = b.zone_id
+          AND a.timestamp = b.timestamp
+          AND a.sensor_type = b.sensor_type
+          AND a.id > b.id;
+
+        ALTER TABLE sensor_readings
+            ADD CONSTRAINT uq_sr UNIQUE (zone_id, timestamp, sensor_type);
+    END IF;
+END $$;
+
+-- ==================== sensor_readings: indexes ====================
+CREATE INDEX IF NOT EXISTS ix_sensor_zone_type_ts ON sensor_readings(zone_id, sensor_type, timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_sr_ts_brin ON sensor_readings USING brin (timestamp) WITH (pages_per_range = 32);
+
+-- Replaced by the BRIN index and the composite index above
+DROP INDEX IF EXISTS ix_sensor_readings_timestamp;
+DROP INDEX IF EXISTS ix_sensor_readings_zone_id;
+
+-- ==================== npk_readings / humidity_readings ====================
+-- These tables are created by the app on first start; skip them if they don't exist yet
+DO $$
+BEGIN
+    IF to_regclass('npk_readings') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS ix_npk_zone_ts ON npk_readings(zone_id, timestamp DESC);
+        CREATE INDEX IF NOT EXISTS ix_npk_ts_brin ON npk_readings USING brin (timestamp) WITH (pages_per_range = 32);
+        DROP INDEX IF EXISTS ix_npk_readings_timestamp;
+        DROP INDEX IF EXISTS ix_npk_readings_zone_id;
+    END IF;
+
+    IF to_regclass('humidity_readings') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS ix_humidity_zone_ts ON humidity_readings(zone_id, timestamp DESC);
+        CREATE INDEX IF NOT EXISTS ix_hum_ts_brin ON humidity_readings USING brin (timestamp) WITH (pages_per_range = 32);
+        DROP INDEX IF EXISTS ix_humidity_readings_timestamp;
+        DROP INDEX IF EXISTS ix_humidity_readings_zone_id;
+    END IF;
+END $$;
+
+COMMIT;
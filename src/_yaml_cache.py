@@ -0,0 +1,42 @@
+"""
+Parsed YAML config cache keyed by file path, mtime and size
+"""
+
+import os
+import copy
+import threading
+from collections import OrderedDict
+import yaml
+
+# libyaml-backed loader when PyYAML was built with it
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+_MAX_ENTRIES = 100
+
+# abs_path -> (st_mtime_ns, st_size, parsed config)
+_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def load_yaml_cached(path):
+    """Load a YAML file, reusing the parsed result while the file is unchanged"""
+    abs_path = os.path.abspath(path)
+    st = os.stat(abs_path)
+
+    with _LOCK:
+        entry = _CACHE.get(abs_path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            _CACHE.move_to_end(abs_path)
+            return copy.deepcopy(entry[2])
+
+    with open(abs_path, 'r') as f:
+        data = yaml.load(f, Loader=_Loader)
+
+    with _LOCK:
+        _CACHE[abs_path] = (st.st_mtime_ns, st.st_size, data)
+        _CACHE.move_to_end(abs_path)
+        if len(_CACHE) > _MAX_ENTRIES:
+            _CACHE.popitem(last=False)
+
+    # Callers get their own copy so mutations never reach the cache
+    return copy.deepcopy(data)
@@ -3,42 +3,61 @@ Database models and storage management
 """
 
 import os
+import threading
+from collections import Counter
 from datetime import datetime, timezone
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from typing import Optional
+from cachetools import TTLCache
+from sqlalchemy import create_engine, event, text, Integer, Float, String, DateTime, Boolean, UniqueConstraint, Index, insert, select, desc, case, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
 from loguru import logger
 
-Base = declarative_base()
+
+class Base(DeclarativeBase):
+    pass
 
 
 class SensorReading(Base):
     """Sensor reading data model"""
     __tablename__ = 'sensor_readings'
+    __table_args__ = (
+        # MQTT redelivers on reconnect; duplicates are dropped via ON CONFLICT DO NOTHING
+        UniqueConstraint('zone_id', 'timestamp', 'sensor_type', name='uq_sr'),
+        # Append-only time series: BRIN is far smaller and cheaper to maintain than B-tree
+        Index('ix_sr_ts_brin', 'timestamp', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
+    )
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    zone_id = Column(String(50), nullable=False, index=True)
-    sensor_type = Column(String(50), nullable=False)
-    value = Column(Float, nullable=False)
-    unit = Column(String(20), nullable=False)
-    depth_cm = Column(Integer, nullable=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    zone_id: Mapped[str] = mapped_column(String(50), nullable=False)
+    sensor_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    value: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
+    unit: Mapped[str] = mapped_column(String(20), nullable=False)
+    depth_cm: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     
     def __repr__(self):
         return f"<SensorReading(zone={self.zone_id}, type={self.sensor_type}, value={self.value})>"
 
 
+# Serves "latest reading per zone/sensor" lookups as a single index seek
+Index('ix_sensor_zone_type_ts', SensorReading.zone_id, SensorReading.sensor_type, SensorReading.timestamp.desc())
+
+
 class IrrigationEvent(Base):
     """Irrigation event log"""
     __tablename__ = 'irrigation_events'
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    zone_id = Column(String(50), nullable=False, index=True)
-    amount_mm = Column(Float, nullable=False)
-    duration_minutes = Column(Integer, nullable=True)
-    automated = Column(Boolean, default=False)
-    reason = Column(String(200), nullable=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    zone_id: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
+    amount_mm: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
+    duration_minutes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    automated: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    reason: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
     
     def __repr__(self):
         return f"<IrrigationEvent(zone={self.zone_id}, amount={self.amount_mm}mm)>"
@@ -48,15 +67,15 @@ class SoilAnalysis(Base):
     """Soil water analysis results"""
     __tablename__ = 'soil_analysis'
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    zone_id = Column(String(50), nullable=False, index=True)
-    paw_percentage = Column(Float, nullable=False)
-    irrigation_needed = Column(Boolean, nullable=False)
-    predicted_days_to_threshold = Column(Integer, nullable=True)
-    field_capacity = Column(Float, nullable=True)
-    wilting_point = Column(Float, nullable=True)
-    current_moisture = Column(Float, nullable=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    zone_id: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
+    paw_percentage: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
+    irrigation_needed: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    predicted_days_to_threshold: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    field_capacity: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)
+    wilting_point: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)
+    current_moisture: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)
     
     def __repr__(self):
         return f"<SoilAnalysis(zone={self.zone_id}, PAW={self.paw_percentage}%)>"
@@ -73,8 +92,34 @@ class DatabaseManager:
             )
         
         self.engine = create_engine(database_url, echo=False)
+        self._is_postgres = self.engine.dialect.name == 'postgresql'
+        if self._is_postgres:
+            # Sensor data is best-effort: skip the per-COMMIT WAL fsync by default
+            event.listen(self.engine, "connect", self._disable_synchronous_commit)
         self.Session = sessionmaker(bind=self.engine)
-        logger.info(f"🗄️  Database connected: {database_url.split('@')[1]}")
+        
+        # Short-lived cache for latest-reading lookups, keyed on (zone_id, sensor_type)
+        self._qcache = TTLCache(maxsize=10_000, ttl=5.0)
+        self._qcache_gen = Counter()  # bumped on every write so in-flight reads don't refill stale rows
+        self._qcache_lock = threading.Lock()
+        
+        # Per-zone event tallies, flushed to the log once per summary interval
+        self._irrigation_counter = Counter()
+        self._irrigation_mm = Counter()
+        self._fertilizer_counter = Counter()
+        self._fertilizer_kg = Counter()
+        self._counter_lock = threading.Lock()
+        self._summary_stop = threading.Event()
+        self._summary_thread = threading.Thread(target=self._event_summary_loop, daemon=True)
+        self._summary_thread.start()
+        self.safe_url = make_url(database_url).render_as_string(hide_password=True)
+        logger.info(f"🗄️  Database connected: {self.safe_url}")
+    
+    @staticmethod
+    def _disable_synchronous_commit(dbapi_conn, connection_record):
+        with dbapi_conn.cursor() as cursor:
+            cursor.execute("SET synchronous_commit = off")
+        dbapi_conn.commit()
     
     def create_tables(self):
         """Create all tables"""
@@ -85,29 +130,112 @@ class DatabaseManager:
         """Get new database session"""
         return self.Session()
     
+    def get_durable_session(self):
+        """Get a session whose transaction commits with synchronous_commit on"""
+        session = self.Session()
+        if self._is_postgres:
+            # Irrigation/fertilizer events are physically consequential: keep them durable
+            session.execute(text("SET LOCAL synchronous_commit = on"))
+        return session
+    
+    def close(self):
+        """Stop the summary thread, log any pending tallies and release pooled connections"""
+        self._summary_stop.set()
+        self._summary_thread.join(timeout=5)
+        self.log_event_summary()
+        self.engine.dispose()
+        logger.info("🗄️  Database connections closed")
+    
+    def _event_summary_loop(self, interval_seconds=60):
+        """Periodically log a per-zone summary of irrigation/fertilizer events"""
+        while not self._summary_stop.wait(interval_seconds):
+            self.log_event_summary(interval_seconds)
+    
+    def log_event_summary(self, interval_seconds=60):
+        """Log and reset the accumulated event counters"""
+        with self._counter_lock:
+            irrigation = [(z, n, self._irrigation_mm[z]) for z, n in self._irrigation_counter.items()]
+            fertilizer = [(z, n, self._fertilizer_kg[z]) for z, n in self._fertilizer_counter.items()]
+            self._irrigation_counter.clear()
+            self._irrigation_mm.clear()
+            self._fertilizer_counter.clear()
+            self._fertilizer_kg.clear()
+        
+        if irrigation:
+            zones = ", ".join(f"{z}: {n} events {mm:g}mm" for z, n, mm in irrigation)
+            logger.info(f"💧 Irrigation events (last {interval_seconds}s): {zones}")
+        if fertilizer:
+            zones = ", ".join(f"{z}: {n} events {kg:g}kg" for z, n, kg in fertilizer)
+            logger.info(f"🌿 Fertilizer events (last {interval_seconds}s): {zones}")
+    
+    def get_latest_reading(self, zone_id, sensor_type):
+        """Get most recent sensor reading for a zone (cached for a few seconds)"""
+        key = (zone_id, sensor_type)
+        with self._qcache_lock:
+            hit = self._qcache.get(key)
+            gen = self._qcache_gen[key]
+        if hit is not None:
+            return hit
+        
+        session = self.get_session()
+        try:
+            row = session.scalar(
+                select(SensorReading).where(
+                    SensorReading.zone_id == zone_id,
+                    SensorReading.sensor_type == sensor_type
+                ).order_by(desc(SensorReading.timestamp)).limit(1)
+            )
+        finally:
+            session.close()
+        
+        if row is not None:
+            with self._qcache_lock:
+                if self._qcache_gen[key] == gen:
+                    self._qcache[key] = row
+        return row
+    
+    def _invalidate_latest(self, rows):
+        """Drop cached latest readings for every (zone_id, sensor_type) just written"""
+        with self._qcache_lock:
+            for key in {(row['zone_id'], row['sensor_type']) for row in rows}:
+                self._qcache_gen[key] += 1
+                self._qcache.pop(key, None)
+    
     def store_sensor_reading(self, timestamp, zone_id, sensor_type, value, unit, depth_cm=None):
-        """Store sensor reading"""
+        """Store sensor reading (duplicates are ignored)"""
+        self.store_sensor_readings_batch([{
+            'timestamp': timestamp,
+            'zone_id': zone_id,
+            'sensor_type': sensor_type,
+            'value': value,
+            'unit': unit,
+            'depth_cm': depth_cm
+        }])
+    
+    def store_sensor_readings_batch(self, rows):
+        """Store many sensor readings in one INSERT ... ON CONFLICT DO NOTHING (False if it failed)"""
+        if not rows:
+            return True
+        
         session = self.get_session()
         try:
-            reading = SensorReading(
-                timestamp=timestamp,
-                zone_id=zone_id,
-                sensor_type=sensor_type,
-                value=value,
-                unit=unit,
-                depth_cm=depth_cm
+            stmt = pg_insert(SensorReading).values(rows).on_conflict_do_nothing(
+                index_elements=['zone_id', 'timestamp', 'sensor_type']
             )
-            session.add(reading)
+            session.execute(stmt)
             session.commit()
+            return True
         except Exception as e:
             session.rollback()
-            logger.error(f"Error storing sensor reading: {e}")
+            logger.error(f"Error storing sensor readings: {e}")
+            return False
         finally:
             session.close()
+            self._invalidate_latest(rows)
     
     def store_irrigation_event(self, timestamp, zone_id, amount_mm, automated=False, reason=None):
         """Store irrigation event"""
-        session = self.get_session()
+        session = self.get_durable_session()
         try:
             event = IrrigationEvent(
                 timestamp=timestamp,
@@ -118,7 +246,10 @@ class DatabaseManager:
             )
             session.add(event)
             session.commit()
-            logger.info(f"💧 Irrigation event logged: {zone_id}, {amount_mm}mm")
+            with self._counter_lock:
+                self._irrigation_counter[zone_id] += 1
+                self._irrigation_mm[zone_id] += amount_mm
+            logger.debug("💧 Irrigation event logged: {}, {}mm", zone_id, amount_mm)
         except Exception as e:
             session.rollback()
             logger.error(f"Error storing irrigation event: {e}")
@@ -149,6 +280,26 @@ class DatabaseManager:
             logger.error(f"Error storing soil analysis: {e}")
         finally:
             session.close()
+    
+    def store_soil_analyses_bulk(self, rows):
+        """Store many soil analysis results, returning their generated ids in one round trip"""
+        if not rows:
+            return []
+        
+        session = self.get_session()
+        try:
+            ids = session.execute(
+                insert(SoilAnalysis).returning(SoilAnalysis.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            session.commit()
+            return ids
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error storing soil analyses: {e}")
+            return []
+        finally:
+            session.close()
+    
     def store_npk_reading(self, timestamp, zone_id, nitrogen, phosphorus, potassium, depth_cm=None):
         """Store NPK sensor reading"""
         session = self.get_session()
@@ -187,7 +338,7 @@ class DatabaseManager:
             session.close()
 
     def store_fertilizer_event(self, timestamp, zone_id, nutrient, amount_kg, automated=False, reason=None):
-        session = self.get_session()
+        session = self.get_durable_session()
         try:
             event = FertilizerEvent(
                 timestamp=timestamp,
@@ -199,7 +350,10 @@ class DatabaseManager:
             )
             session.add(event)
             session.commit()
-            logger.info(f"🌿 Fertilizer event logged: {zone_id}, {amount_kg}kg {nutrient}")
+            with self._counter_lock:
+                self._fertilizer_counter[zone_id] += 1
+                self._fertilizer_kg[zone_id] += amount_kg
+            logger.debug("🌿 Fertilizer event logged: {}, {}kg {}", zone_id, amount_kg, nutrient)
         except Exception as e:
             session.rollback()
             logger.error(f"Error storing fertilizer event: {e}")
@@ -229,28 +383,56 @@ class DatabaseManager:
 class NPKReading(Base):
     """NPK nutrient sensor readings"""
     __tablename__ = 'npk_readings'
+    __table_args__ = (
+        Index('ix_npk_ts_brin', 'timestamp', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    zone_id: Mapped[str] = mapped_column(String(50), nullable=False)
+    nitrogen: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)  # mg/kg
+    phosphorus: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)  # mg/kg
+    potassium: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)  # mg/kg
+    depth_cm: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    zone_id = Column(String(50), nullable=False, index=True)
-    nitrogen = Column(Float, nullable=True)       # mg/kg
-    phosphorus = Column(Float, nullable=True)     # mg/kg
-    potassium = Column(Float, nullable=True)      # mg/kg
-    depth_cm = Column(Integer, nullable=True)
+    @hybrid_property
+    def status(self) -> str:
+        """Nutrient status tier: LOW, OPTIMAL or ADEQUATE"""
+        n, p, k = self.nitrogen, self.phosphorus, self.potassium
+        # Same outcome as the SQL CASE under NULL logic: a missing nutrient never makes
+        # a reading LOW, and a reading with one missing is never OPTIMAL
+        if (n is not None and n < 40) or (p is not None and p < 25) or (k is not None and k < 100):
+            return 'LOW'
+        if n is not None and p is not None and k is not None and n > 80 and p > 40 and k > 150:
+            return 'OPTIMAL'
+        return 'ADEQUATE'
+    
+    @status.inplace.expression
+    @classmethod
+    def _status_expression(cls):
+        return case(
+            (or_(cls.nitrogen < 40, cls.phosphorus < 25, cls.potassium < 100), 'LOW'),
+            (and_(cls.nitrogen > 80, cls.phosphorus > 40, cls.potassium > 150), 'OPTIMAL'),
+            else_='ADEQUATE'
+        )
     
     def __repr__(self):
         return f"<NPKReading(zone={self.zone_id}, N={self.nitrogen}, P={self.phosphorus}, K={self.potassium})>"
 
 
+Index('ix_npk_zone_ts', NPKReading.zone_id, NPKReading.timestamp.desc())
+
+
 class WaterLevelReading(Base):
     """Water reservoir level readings"""
     __tablename__ = 'water_level_readings'
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    current_liters = Column(Float, nullable=False)
-    capacity_liters = Column(Float, nullable=False)
-    level_percent = Column(Float, nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    current_liters: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
+    capacity_liters: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
+    level_percent: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
     
     def __repr__(self):
         return f"<WaterLevelReading(level={self.level_percent}%, {self.current_liters}L)>"
@@ -260,13 +442,13 @@ class FertilizerEvent(Base):
     """Fertilizer application log"""
     __tablename__ = 'fertilizer_events'
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    zone_id = Column(String(50), nullable=False, index=True)
-    nutrient = Column(String(10), nullable=False)  # 'N', 'P', or 'K'
-    amount_kg = Column(Float, nullable=False)
-    automated = Column(Boolean, default=False)
-    reason = Column(String(200), nullable=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    zone_id: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
+    nutrient: Mapped[str] = mapped_column(String(10), nullable=False)  # 'N', 'P', or 'K'
+    amount_kg: Mapped[float] = mapped_column(Float(precision=24), nullable=False)
+    automated: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    reason: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
     
     def __repr__(self):
         return f"<FertilizerEvent(zone={self.zone_id}, nutrient={self.nutrient}, amount={self.amount_kg}kg)>"
@@ -276,14 +458,21 @@ class FertilizerEvent(Base):
 class HumidityReading(Base):
     """Air humidity sensor readings"""
     __tablename__ = 'humidity_readings'
+    __table_args__ = (
+        Index('ix_hum_ts_brin', 'timestamp', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
+    )
     
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    timestamp = Column(DateTime, nullable=False, index=True)
-    zone_id = Column(String(50), nullable=False, index=True)
-    humidity = Column(Float, nullable=False)          # % RH
-    temperature = Column(Float, nullable=True)         # °C (DHT22 reads both)
-    heat_index = Column(Float, nullable=True)          # °C
-    dew_point = Column(Float, nullable=True)           # °C
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    zone_id: Mapped[str] = mapped_column(String(50), nullable=False)
+    humidity: Mapped[float] = mapped_column(Float(precision=24), nullable=False)  # % RH
+    temperature: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)  # °C (DHT22 reads both)
+    heat_index: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)  # °C
+    dew_point: Mapped[Optional[float]] = mapped_column(Float(precision=24), nullable=True)  # °C
     
     def __repr__(self):
-        return f"<HumidityReading(zone={self.zone_id}, humidity={self.humidity}% RH)>"
\ No newline at end of file
+        return f"<HumidityReading(zone={self.zone_id}, humidity={self.humidity}% RH)>"
+
+
+Index('ix_humidity_zone_ts', HumidityReading.zone_id, HumidityReading.timestamp.desc())
@@ -3,17 +3,23 @@ Irrigation Job Scheduler
 Publishes all events to MQTT for mobile app consumption
 """
 
+import os
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Optional
 from loguru import logger
-import json
+import orjson
+import paho.mqtt.client as mqtt
 
 from data_storage import DatabaseManager, SensorReading, NPKReading, HumidityReading
 from pump_model_client import PumpModelClient, MockMLModelService
 from water_pump_simulator import WaterPumpSimulator
 
+# MQTT payload encoder: returns bytes and serializes datetimes natively (RFC 3339)
+_dumps = orjson.dumps
+
 
 class IrrigationJob:
     """Scheduled job for automated irrigation decisions"""
@@ -23,31 +29,69 @@ class IrrigationJob:
                  mqtt_client,
                  ml_model_url: Optional[str] = None,
                  interval_minutes: int = 30,
-                 use_mock_model: bool = True):
+                 use_mock_model: bool = True,
+                 granular_events: bool = True,
+                 ml_backend: str = 'http',
+                 ml_model_path: Optional[str] = None):
         """Initialize Irrigation Job"""
         self.db_manager = db_manager
         self.mqtt_client = mqtt_client
         self.interval_minutes = interval_minutes
         self.use_mock_model = use_mock_model
         
+        # Per-step event topics for realtime subscribers; the per-execution
+        # irrigation/job/summary message is always published
+        self.granular_events = granular_events
+        
         # Initialize ML client
         if use_mock_model:
             logger.info("🤖 Using MOCK ML Model (local)")
             self.ml_client = None
         else:
-            self.ml_client = PumpModelClient(ml_model_url or "http://ml-service:8000/predict")
+            self.ml_client = PumpModelClient(
+                ml_model_url or "http://ml-service:8000/predict",
+                backend=ml_backend,
+                model_path=ml_model_path
+            )
         
-        # Initialize water pump simulator
+        # Initialize water pump simulator (shared across zone workers)
         self.pump = WaterPumpSimulator(pump_flow_rate_lpm=20.0, area_sqm=100.0)
+        self._pump_lock = threading.Lock()
+        
+        # Zones are independent: overlap their DB/ML/MQTT I/O on a small pool
+        self._pool = self._make_pool()
         
         # Job control
         self.running = False
         self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
         self.execution_count = 0
         self.last_execution: Optional[datetime] = None
         
+        # Informational events published during execute() are buffered and flushed as one
+        # burst (or dropped when granular_events is off, the summary carries them);
+        # irrigation lifecycle events always go out immediately, right after whatever
+        # was buffered ahead of them
+        self._pending_events: list = []
+        self._pending_lock = threading.Lock()
+        self._batching = False
+        
+        # Full topic strings keyed by their (kind, [zone_id,] event_type) parts
+        self._topic_cache: Dict[tuple, str] = {}
+        
+        # Active zones rarely change: (monotonic fetch time, zones)
+        self._zones_cache: tuple = (0.0, [])
+        self._zones_cache_ttl = 3600
+        
         logger.info(f"⏰ Irrigation Job initialized: Interval={interval_minutes} minutes")
     
+    @staticmethod
+    def _make_pool() -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=min(8, (os.cpu_count() or 1) * 2),
+            thread_name_prefix='irrig-zone'
+        )
+    
     def set_mqtt_client(self, mqtt_client):
         """Set or update MQTT client"""
         self.mqtt_client = mqtt_client
@@ -63,15 +107,17 @@ class IrrigationJob:
             logger.warning("⚠️  MQTT client not set - some features may not work")
         
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._run_loop, daemon=True)
         self.thread.start()
         logger.info(f"🚀 Irrigation Job started (every {self.interval_minutes} minutes)")
         
         # Publish job started event
-        self._publish_job_event("job_started", {
-            "interval_minutes": self.interval_minutes,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
+        if self.mqtt_client:
+            self._publish_job_event("job_started", {
+                "interval_minutes": self.interval_minutes,
+                "timestamp": datetime.now(timezone.utc)
+            })
     
     def stop(self):
         """Stop the irrigation job"""
@@ -79,126 +125,192 @@ class IrrigationJob:
             return
         
         self.running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join(timeout=5)
         
+        # Drop zones that haven't started yet; the next execution builds a fresh pool
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        
         # Publish job stopped event
-        self._publish_job_event("job_stopped", {
-            "total_executions": self.execution_count,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
+        if self.mqtt_client:
+            self._publish_job_event("job_stopped", {
+                "total_executions": self.execution_count,
+                "timestamp": datetime.now(timezone.utc)
+            })
         
         logger.info("⏹️  Irrigation Job stopped")
     
     def _run_loop(self):
         """Main job execution loop"""
-        while self.running:
+        while not self._stop_event.is_set():
             try:
                 self.execute()
                 
-                # Sleep for interval
-                sleep_seconds = self.interval_minutes * 60
-                for _ in range(sleep_seconds):
-                    if not self.running:
-                        break
-                    time.sleep(1)
+                # Sleep for interval, waking immediately on stop()
+                if self._stop_event.wait(self.interval_minutes * 60):
+                    break
                     
             except Exception as e:
-                logger.error(f"❌ Error in irrigation job loop: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"❌ Error in irrigation job loop: {e}")
                 
                 # Publish error event
-                self._publish_job_event("job_error", {
-                    "error": str(e),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                })
+                if self.mqtt_client:
+                    self._publish_job_event("job_error", {
+                        "error": str(e),
+                        "timestamp": datetime.now(timezone.utc)
+                    })
                 
-                time.sleep(60)
+                if self._stop_event.wait(60):
+                    break
     
     def execute(self):
         """Execute one iteration of the irrigation job"""
+        with self._pending_lock:
+            self._batching = True
+        summary = None
+        try:
+            summary = self._execute_once()
+        finally:
+            self._flush_events(summary)
+    
+    def _execute_once(self) -> Dict:
+        """Run the zone evaluation for one execution and return its summary (events are buffered)"""
+        # One clock read per execution, shared by every event it emits
+        now = datetime.now(timezone.utc)
+        
         self.execution_count += 1
-        self.last_execution = datetime.now(timezone.utc)
+        self.last_execution = now
         
         logger.info("="*60)
         logger.info(f"🔄 IRRIGATION JOB EXECUTION #{self.execution_count}")
         logger.info(f"⏰ Time: {self.last_execution.strftime('%Y-%m-%d %H:%M:%S UTC')}")
         logger.info("="*60)
         
+        summary = {
+            "execution": self.execution_count,
+            "zones": {},
+            "timestamp": now
+        }
+        
         # Publish job execution started event
-        self._publish_job_event("execution_started", {
-            "execution_number": self.execution_count,
-            "timestamp": self.last_execution.isoformat()
-        })
+        if self.mqtt_client:
+            self._publish_job_event("execution_started", {
+                "execution_number": self.execution_count,
+                "timestamp": now
+            }, ts=now)
         
         # Get all zones
-        zones = self._get_active_zones()
+        zones = self._get_active_zones(now)
         
         if not zones:
             logger.warning("⚠️  No active zones found")
-            self._publish_job_event("no_zones_found", {
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
-            return
+            if self.mqtt_client:
+                self._publish_job_event("no_zones_found", {
+                    "timestamp": now
+                }, ts=now)
+            return summary
         
         logger.info(f"📍 Evaluating {len(zones)} zone(s): {', '.join(zones)}")
         
         # Publish zones being evaluated
-        self._publish_job_event("zones_evaluation", {
-            "zones": zones,
-            "count": len(zones),
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
+        if self.mqtt_client:
+            self._publish_job_event("zones_evaluation", {
+                "zones": zones,
+                "count": len(zones),
+                "timestamp": now
+            }, ts=now)
+        
+        # Gather metrics for all zones up front (one query per table)
+        zone_metrics = self._gather_metrics_bulk(zones, now)
+        
+        # Process zones concurrently (stop() shuts the pool down, so rebuild it on demand)
+        pool = self._pool
+        if pool is None:
+            pool = self._pool = self._make_pool()
+        futures = {
+            pool.submit(self._process_zone, zone_id, zone_metrics.get(zone_id), now): zone_id
+            for zone_id in zones
+        }
         
-        # Process each zone
         results = []
-        for zone_id in zones:
+        for future in as_completed(futures):
+            zone_id = futures[future]
             try:
-                result = self._process_zone(zone_id)
+                result = future.result()
                 results.append(result)
+                summary["zones"][zone_id] = {
+                    "metrics": result.get('metrics'),
+                    "decision": result.get('decision'),
+                    "irrigation": result.get('irrigation')
+                }
             except Exception as e:
-                logger.error(f"❌ Error processing zone {zone_id}: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"❌ Error processing zone {zone_id}: {e}")
+                summary["zones"][zone_id] = {"error": str(e)}
                 
                 # Publish zone error
-                self._publish_zone_event(zone_id, "zone_error", {
-                    "error": str(e),
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                })
+                if self.mqtt_client:
+                    self._publish_zone_event(zone_id, "zone_error", {
+                        "error": str(e),
+                        "timestamp": now
+                    }, ts=now)
         
         logger.info("="*60)
         logger.info(f"✅ Job execution completed. Next run in {self.interval_minutes} minutes")
         logger.info("="*60)
         
-        # Publish execution completed event
-        self._publish_job_event("execution_completed", {
-            "execution_number": self.execution_count,
+        summary.update({
             "zones_processed": len(results),
             "irrigations_performed": sum(1 for r in results if r.get('irrigated')),
-            "next_run": (self.last_execution + timedelta(minutes=self.interval_minutes)).isoformat(),
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "next_run": self.last_execution + timedelta(minutes=self.interval_minutes)
         })
+        
+        # Publish execution completed event
+        if self.mqtt_client and self.granular_events:
+            self._publish_job_event("execution_completed", {
+                "execution_number": self.execution_count,
+                "zones_processed": summary["zones_processed"],
+                "irrigations_performed": summary["irrigations_performed"],
+                "next_run": summary["next_run"],
+                "timestamp": now
+            }, ts=now)
+        
+        return summary
+    
+    def invalidate_zone_cache(self):
+        """Force the next execution to re-query active zones (e.g. new sensor registered)"""
+        self._zones_cache = (0.0, [])
     
-    def _get_active_zones(self) -> list:
+    def _get_active_zones(self, now: datetime) -> list:
         """Get list of active zones from database"""
+        fetched_at, cached_zones = self._zones_cache
+        if cached_zones and time.monotonic() - fetched_at < self._zones_cache_ttl:
+            return cached_zones
+        
         session = self.db_manager.get_session()
         try:
-            from sqlalchemy import func, distinct
+            from sqlalchemy import select
             
-            cutoff_time = datetime.utcnow() - timedelta(hours=24)
+            cutoff_time = now - timedelta(hours=24)
             
-            recent_zones = session.query(distinct(SensorReading.zone_id)).filter(
-                SensorReading.sensor_type == 'moisture',
-                SensorReading.timestamp >= cutoff_time,
-                SensorReading.zone_id.isnot(None),
-                SensorReading.zone_id != 'N/A'
-            ).limit(10).all()
+            # GROUP BY lets the (zone_id, sensor_type, timestamp) index serve the
+            # query instead of materializing a full DISTINCT set before LIMIT
+            recent_zones = session.execute(
+                select(SensorReading.zone_id).where(
+                    SensorReading.sensor_type == 'moisture',
+                    SensorReading.timestamp >= cutoff_time,
+                    SensorReading.zone_id.isnot(None),
+                    SensorReading.zone_id != 'N/A'
+                ).group_by(SensorReading.zone_id).limit(10)
+            ).scalars().all()
             
-            zones = [z[0] for z in recent_zones if z[0]]
+            zones = [z for z in recent_zones if z]
             
-            if not zones:
+            if zones:
+                self._zones_cache = (time.monotonic(), zones)
+            else:
                 logger.info("   No zones with recent data, using default: zone-1")
                 zones = ['zone-1']
             
@@ -207,36 +319,35 @@ class IrrigationJob:
         finally:
             session.close()
     
-    def _process_zone(self, zone_id: str) -> Dict:
+    def _process_zone(self, zone_id: str, metrics: Optional[Dict], now: datetime) -> Dict:
         """Process irrigation decision for a single zone"""
-        logger.info(f"\n{'─'*60}")
-        logger.info(f"🌱 Processing Zone: {zone_id}")
-        logger.info(f"{'─'*60}")
+        logger.info(f"\n🌱 Processing Zone: {zone_id}")
         
         result = {
             "zone_id": zone_id,
             "irrigated": False,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": now
         }
         
-        # Step 1: Gather current metrics
-        metrics = self._gather_metrics(zone_id)
-        
+        # Step 1: Current metrics (pre-gathered by execute())
         if not metrics:
-            logger.warning(f"⚠️  No metrics available for {zone_id}")
-            self._publish_zone_event(zone_id, "no_metrics", {
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
+            logger.warning(f"[{zone_id}] ⚠️  No metrics available")
+            if self.mqtt_client:
+                self._publish_zone_event(zone_id, "no_metrics", {
+                    "timestamp": now
+                }, ts=now)
             return result
         
-        logger.info(f"📊 Current Metrics:")
-        logger.info(f"   💦 Moisture: {metrics.get('moisture_percent', 'N/A')}%")
-        logger.info(f"   🌡️  Temperature: {metrics.get('temperature_celsius', 'N/A')}°C")
-        logger.info(f"   🌫️  Humidity: {metrics.get('humidity_percent', 'N/A')}%")
-        logger.info(f"   🌿 NPK Status: {metrics.get('npk_status', 'N/A')}")
+        logger.info(f"[{zone_id}] 📊 Current Metrics:")
+        logger.info(f"[{zone_id}]    💦 Moisture: {metrics.get('moisture_percent', 'N/A')}%")
+        logger.info(f"[{zone_id}]    🌡️  Temperature: {metrics.get('temperature_celsius', 'N/A')}°C")
+        logger.info(f"[{zone_id}]    🌫️  Humidity: {metrics.get('humidity_percent', 'N/A')}%")
+        logger.info(f"[{zone_id}]    🌿 NPK Status: {metrics.get('npk_status', 'N/A')}")
+        
+        result['metrics'] = metrics
         
         # Publish metrics gathered event
-        self._publish_zone_event(zone_id, "metrics_gathered", metrics)
+        self._publish_zone_event(zone_id, "metrics_gathered", metrics, ts=now)
         
         # Step 2: Get ML model decision
         if self.use_mock_model:
@@ -244,125 +355,166 @@ class IrrigationJob:
         else:
             decision = self.ml_client.predict_irrigation(metrics)
         
-        logger.info(f"\n🤖 ML Model Decision:")
-        logger.info(f"   Should Irrigate: {decision['should_irrigate']}")
-        logger.info(f"   Confidence: {decision['confidence']:.1%}")
-        logger.info(f"   Recommended Amount: {decision['recommended_amount_mm']}mm")
-        logger.info(f"   Reason: {decision['reason']}")
+        logger.info(f"\n[{zone_id}] 🤖 ML Model Decision:")
+        logger.info(f"[{zone_id}]    Should Irrigate: {decision['should_irrigate']}")
+        logger.info(f"[{zone_id}]    Confidence: {decision['confidence']:.1%}")
+        logger.info(f"[{zone_id}]    Recommended Amount: {decision['recommended_amount_mm']}mm")
+        logger.info(f"[{zone_id}]    Reason: {decision['reason']}")
         
         # Publish ML decision event
-        self._publish_zone_event(zone_id, "ml_decision", decision)
+        self._publish_zone_event(zone_id, "ml_decision", decision, ts=now)
         
         result['decision'] = decision
         
         # Step 3: Execute irrigation if needed
         if decision['should_irrigate']:
-            irrigation_result = self._execute_irrigation(zone_id, decision, metrics)
+            irrigation_result = self._execute_irrigation(zone_id, decision, metrics, now)
             result['irrigated'] = irrigation_result.get('success', False)
             result['irrigation'] = irrigation_result
         else:
-            logger.info(f"✅ {zone_id}: No irrigation needed - {decision['reason']}")
-            self._publish_zone_event(zone_id, "irrigation_skipped", {
-                "reason": decision['reason'],
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
+            logger.info(f"[{zone_id}] ✅ No irrigation needed - {decision['reason']}")
+            if self.mqtt_client:
+                self._publish_zone_event(zone_id, "irrigation_skipped", {
+                    "reason": decision['reason'],
+                    "timestamp": now
+                }, ts=now)
         
         return result
     
-    def _gather_metrics(self, zone_id: str) -> Optional[Dict]:
+    def _gather_metrics(self, zone_id: str, now: Optional[datetime] = None) -> Optional[Dict]:
         """Gather current metrics for a zone"""
+        return self._gather_metrics_bulk([zone_id], now or datetime.now(timezone.utc)).get(zone_id)
+    
+    def _gather_metrics_bulk(self, zones: list, now: datetime) -> Dict[str, Dict]:
+        """Gather current metrics for many zones with one query per table"""
+        if not zones:
+            return {}
+        
         session = self.db_manager.get_session()
         
         try:
-            from sqlalchemy import desc
-            
-            metrics = {}
-            
-            # Get latest moisture
-            moisture = session.query(SensorReading).filter(
-                SensorReading.zone_id == zone_id,
-                SensorReading.sensor_type == 'moisture'
-            ).order_by(desc(SensorReading.timestamp)).first()
-            
-            if moisture:
-                metrics['moisture_percent'] = moisture.value
-            else:
-                logger.warning(f"⚠️  No moisture data for {zone_id}")
-                return None
-            
-            # Get latest temperature
-            temperature = session.query(SensorReading).filter(
-                SensorReading.zone_id == zone_id,
-                SensorReading.sensor_type == 'temperature'
-            ).order_by(desc(SensorReading.timestamp)).first()
-            
-            metrics['temperature_celsius'] = temperature.value if temperature else 25.0
-            
-            # Get latest humidity
-            humidity = session.query(HumidityReading).filter(
-                HumidityReading.zone_id == zone_id
-            ).order_by(desc(HumidityReading.timestamp)).first()
-            
-            metrics['humidity_percent'] = humidity.humidity if humidity else 60.0
-            
-            # Get latest NPK
-            npk = session.query(NPKReading).filter(
-                NPKReading.zone_id == zone_id
-            ).order_by(desc(NPKReading.timestamp)).first()
-            
-            if npk:
-                metrics['nitrogen_mgkg'] = npk.nitrogen
-                metrics['phosphorus_mgkg'] = npk.phosphorus
-                metrics['potassium_mgkg'] = npk.potassium
-                
-                if npk.nitrogen < 40 or npk.phosphorus < 25 or npk.potassium < 100:
-                    metrics['npk_status'] = 'LOW'
-                elif npk.nitrogen > 80 and npk.phosphorus > 40 and npk.potassium > 150:
-                    metrics['npk_status'] = 'OPTIMAL'
-                else:
-                    metrics['npk_status'] = 'ADEQUATE'
-            else:
-                metrics['npk_status'] = 'UNKNOWN'
-            
-            metrics['rainfall_mm_24h'] = 0.0
-            metrics['zone_id'] = zone_id
-            metrics['timestamp'] = datetime.utcnow().isoformat()
+            sensor_rows = self._latest_rows(
+                session,
+                (SensorReading.zone_id, SensorReading.sensor_type, SensorReading.value),
+                (SensorReading.zone_id, SensorReading.sensor_type),
+                SensorReading.timestamp,
+                SensorReading.zone_id.in_(zones),
+                SensorReading.sensor_type.in_(('moisture', 'temperature'))
+            )
             
-            return metrics
+            humidity_rows = self._latest_rows(
+                session,
+                (HumidityReading.zone_id, HumidityReading.humidity),
+                (HumidityReading.zone_id,),
+                HumidityReading.timestamp,
+                HumidityReading.zone_id.in_(zones)
+            )
             
+            npk_rows = self._latest_rows(
+                session,
+                (NPKReading.zone_id, NPKReading.nitrogen, NPKReading.phosphorus, NPKReading.potassium,
+                 NPKReading.status.label('status')),
+                (NPKReading.zone_id,),
+                NPKReading.timestamp,
+                NPKReading.zone_id.in_(zones)
+            )
         finally:
             session.close()
+        
+        # Pivot rows into per-zone lookups
+        sensors = {}
+        for zone_id, sensor_type, value in sensor_rows:
+            sensors.setdefault(zone_id, {})[sensor_type] = value
+        humidity = {zone_id: value for zone_id, value in humidity_rows}
+        npk = {zone_id: (n, p, k, status) for zone_id, n, p, k, status in npk_rows}
+        
+        results = {}
+        for zone_id in zones:
+            zone_sensors = sensors.get(zone_id, {})
+            metrics = self._build_metrics(
+                zone_id,
+                zone_sensors.get('moisture'),
+                zone_sensors.get('temperature'),
+                humidity.get(zone_id),
+                npk.get(zone_id),
+                now
+            )
+            if metrics:
+                results[zone_id] = metrics
+        
+        return results
+    
+    @staticmethod
+    def _latest_rows(session, columns, partition_by, timestamp, *criteria) -> list:
+        """Latest row per partition_by group (ROW_NUMBER() rather than Postgres-only DISTINCT ON)"""
+        from sqlalchemy import select, desc, func
+        
+        rank = func.row_number().over(partition_by=partition_by, order_by=desc(timestamp)).label('rn')
+        ranked = select(*columns, rank).where(*criteria).subquery()
+        return session.execute(
+            select(*(c for c in ranked.c if c.name != 'rn')).where(ranked.c.rn == 1)
+        ).all()
+    
+    def _build_metrics(self, zone_id: str, moisture, temperature, humidity, npk, now: datetime) -> Optional[Dict]:
+        """Build the metrics dict from the latest raw readings of a zone"""
+        if moisture is None:
+            logger.warning(f"⚠️  No moisture data for {zone_id}")
+            return None
+        
+        metrics = {
+            'moisture_percent': moisture,
+            'temperature_celsius': temperature if temperature is not None else 25.0,
+            'humidity_percent': humidity if humidity is not None else 60.0
+        }
+        
+        if npk is not None:
+            # Status tier is computed by the database (NPKReading.status)
+            nitrogen, phosphorus, potassium, status = npk
+            metrics['nitrogen_mgkg'] = nitrogen
+            metrics['phosphorus_mgkg'] = phosphorus
+            metrics['potassium_mgkg'] = potassium
+            metrics['npk_status'] = status
+        else:
+            metrics['npk_status'] = 'UNKNOWN'
+        
+        metrics['rainfall_mm_24h'] = 0.0
+        metrics['zone_id'] = zone_id
+        # datetime is fine here: MQTT payloads and ML service requests are both encoded with orjson
+        metrics['timestamp'] = now
+        
+        return metrics
     
-    def _execute_irrigation(self, zone_id: str, decision: Dict, metrics: Dict) -> Dict:
+    def _execute_irrigation(self, zone_id: str, decision: Dict, metrics: Dict, now: datetime) -> Dict:
         """Execute irrigation and update metrics"""
         amount_mm = decision['recommended_amount_mm']
         
-        logger.info(f"\n💧 EXECUTING IRRIGATION:")
-        logger.info(f"   Zone: {zone_id}")
-        logger.info(f"   Amount: {amount_mm}mm")
-        logger.info(f"   Confidence: {decision['confidence']:.1%}")
+        logger.info(f"\n[{zone_id}] 💧 EXECUTING IRRIGATION:")
+        logger.info(f"[{zone_id}]    Amount: {amount_mm}mm")
+        logger.info(f"[{zone_id}]    Confidence: {decision['confidence']:.1%}")
         
         # Publish irrigation started event
-        self._publish_irrigation_event(zone_id, "irrigation_started", {
-            "amount_mm": amount_mm,
-            "confidence": decision['confidence'],
-            "reason": decision['reason'],
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        })
+        if self.mqtt_client:
+            self._publish_irrigation_event(zone_id, "irrigation_started", {
+                "amount_mm": amount_mm,
+                "confidence": decision['confidence'],
+                "reason": decision['reason'],
+                "timestamp": now
+            }, ts=now)
         
         # Step 1: Activate water pump
-        pump_result = self.pump.activate(amount_mm, zone_id)
+        with self._pump_lock:
+            pump_result = self.pump.activate(amount_mm, zone_id)
         
         irrigation_result = {
             "success": pump_result['success'],
             "zone_id": zone_id,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": now
         }
         
         if pump_result['success']:
-            logger.info(f"   ✅ Pump activated successfully")
-            logger.info(f"   ⏱️  Duration: {pump_result['duration_minutes']:.1f} minutes")
-            logger.info(f"   💧 Volume dispensed: {pump_result['volume_liters']:.1f}L")
+            logger.info(f"[{zone_id}]    ✅ Pump activated successfully")
+            logger.info(f"[{zone_id}]    ⏱️  Duration: {pump_result['duration_minutes']:.1f} minutes")
+            logger.info(f"[{zone_id}]    💧 Volume dispensed: {pump_result['volume_liters']:.1f}L")
             
             # Step 2: Calculate new moisture
             current_moisture = metrics['moisture_percent']
@@ -372,7 +524,7 @@ class IrrigationJob:
                 soil_type='loam'
             )
             
-            logger.info(f"   📈 Moisture update: {current_moisture:.1f}% → {new_moisture:.1f}%")
+            logger.info(f"[{zone_id}]    📈 Moisture update: {current_moisture:.1f}% → {new_moisture:.1f}%")
             
             irrigation_result.update({
                 "duration_minutes": pump_result['duration_minutes'],
@@ -384,33 +536,33 @@ class IrrigationJob:
             
             # Step 3: Publish updated moisture
             if self.mqtt_client:
-                self._publish_updated_moisture(zone_id, new_moisture)
+                self._publish_updated_moisture(zone_id, new_moisture, now)
             
             # Step 4: Store irrigation event
-            self._store_irrigation_event(zone_id, amount_mm, decision, pump_result)
+            self._store_irrigation_event(zone_id, amount_mm, decision, pump_result, now)
             
             # Step 5: Publish pump command
             if self.mqtt_client:
                 self._publish_pump_command(zone_id, pump_result, decision)
             
             # Step 6: Publish irrigation completed event
-            self._publish_irrigation_event(zone_id, "irrigation_completed", irrigation_result)
+            self._publish_irrigation_event(zone_id, "irrigation_completed", irrigation_result, ts=now)
             
-            logger.info(f"   ✅ Irrigation completed for {zone_id}")
+            logger.info(f"[{zone_id}]    ✅ Irrigation completed")
             
         else:
-            logger.error(f"   ❌ Pump activation failed: {pump_result['status']}")
+            logger.error(f"[{zone_id}]    ❌ Pump activation failed: {pump_result['status']}")
             irrigation_result['error'] = pump_result['status']
             
             # Publish irrigation failed event
-            self._publish_irrigation_event(zone_id, "irrigation_failed", irrigation_result)
+            self._publish_irrigation_event(zone_id, "irrigation_failed", irrigation_result, ts=now)
         
         return irrigation_result
     
-    def _publish_updated_moisture(self, zone_id: str, new_moisture: float):
+    def _publish_updated_moisture(self, zone_id: str, new_moisture: float, timestamp: datetime):
         """Publish updated moisture reading to MQTT"""
         if not self.mqtt_client:
-            logger.warning(f"   ⚠️  MQTT client not available")
+            logger.warning(f"[{zone_id}]    ⚠️  MQTT client not available")
             return
         
         payload = {
@@ -418,38 +570,38 @@ class IrrigationJob:
             'value': new_moisture,
             'unit': '%',
             'sensor_id': 'moisture-simulator',
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': timestamp,
             'source': 'irrigation_job'
         }
         
         try:
-            result = self.mqtt_client.publish('sensors/soil/moisture', json.dumps(payload), qos=1)
-            if hasattr(result, 'rc') and result.rc == 0:
-                logger.debug(f"   📤 Published updated moisture: {new_moisture:.1f}%")
+            result = self.mqtt_client.publish('sensors/soil/moisture', _dumps(payload), qos=1)
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                logger.debug("[{}]    📤 Published updated moisture: {:.1f}%", zone_id, new_moisture)
         except Exception as e:
-            logger.error(f"   ❌ Error publishing moisture: {e}")
+            logger.error(f"[{zone_id}]    ❌ Error publishing moisture: {e}")
     
     def _store_irrigation_event(self, zone_id: str, amount_mm: float, 
-                                decision: Dict, pump_result: Dict):
+                                decision: Dict, pump_result: Dict, timestamp: datetime):
         """Store irrigation event in database"""
         try:
             reason = f"ML: {decision['reason']} (Confidence: {decision['confidence']:.1%})"
             
             self.db_manager.store_irrigation_event(
-                timestamp=datetime.utcnow(),
+                timestamp=timestamp,
                 zone_id=zone_id,
                 amount_mm=amount_mm,
                 automated=True,
                 reason=reason
             )
-            logger.debug(f"   💾 Stored irrigation event in database")
+            logger.debug(f"[{zone_id}]    💾 Stored irrigation event in database")
         except Exception as e:
-            logger.error(f"   ❌ Failed to store irrigation event: {e}")
+            logger.error(f"[{zone_id}]    ❌ Failed to store irrigation event: {e}")
     
     def _publish_pump_command(self, zone_id: str, pump_result: Dict, decision: Dict):
         """Publish pump activation command to MQTT"""
         if not self.mqtt_client:
-            logger.warning(f"   ⚠️  MQTT client not available")
+            logger.warning(f"[{zone_id}]    ⚠️  MQTT client not available")
             return
         
         command = {
@@ -467,72 +619,101 @@ class IrrigationJob:
         }
         
         try:
-            result = self.mqtt_client.publish('actuators/pump/command', json.dumps(command), qos=1)
-            if hasattr(result, 'rc') and result.rc == 0:
-                logger.debug(f"   📤 Published pump command")
+            result = self.mqtt_client.publish('actuators/pump/command', _dumps(command), qos=1)
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                logger.debug("[{}]    📤 Published pump command", zone_id)
         except Exception as e:
-            logger.error(f"   ❌ Error publishing pump command: {e}")
+            logger.error(f"[{zone_id}]    ❌ Error publishing pump command: {e}")
     
     # ==================== MQTT Event Publishing Methods ====================
     
-    def _publish_job_event(self, event_type: str, data: Dict):
-        """Publish irrigation job event to MQTT"""
+    def _publish_job_event(self, event_type: str, data: Dict, ts: Optional[datetime] = None, qos: int = 0):
+        """Publish irrigation job event to MQTT (informational, QoS 0 by default)"""
         if not self.mqtt_client:
             return
         
-        topic = f"irrigation/job/{event_type}"
-        payload = {
+        self._enqueue(self._topic("job", event_type), {
             "event": event_type,
             "data": data,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        
-        try:
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
-            if hasattr(result, 'rc') and result.rc == 0:
-                logger.debug(f"📤 Published job event: {event_type}")
-        except Exception as e:
-            logger.error(f"❌ Error publishing job event: {e}")
+            "timestamp": ts or datetime.now(timezone.utc)
+        }, qos)
     
-    def _publish_zone_event(self, zone_id: str, event_type: str, data: Dict):
-        """Publish zone-specific event to MQTT"""
+    def _publish_zone_event(self, zone_id: str, event_type: str, data: Dict, ts: Optional[datetime] = None, qos: int = 0):
+        """Publish zone-specific event to MQTT (informational, QoS 0 by default)"""
         if not self.mqtt_client:
             return
         
-        topic = f"irrigation/zones/{zone_id}/{event_type}"
-        payload = {
+        self._enqueue(self._topic("zones", zone_id, event_type), {
             "zone_id": zone_id,
             "event": event_type,
             "data": data,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        
-        try:
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
-            if hasattr(result, 'rc') and result.rc == 0:
-                logger.debug(f"📤 Published zone event: {zone_id}/{event_type}")
-        except Exception as e:
-            logger.error(f"❌ Error publishing zone event: {e}")
+            "timestamp": ts or datetime.now(timezone.utc)
+        }, qos)
     
-    def _publish_irrigation_event(self, zone_id: str, event_type: str, data: Dict):
-        """Publish irrigation-specific event to MQTT"""
+    def _publish_irrigation_event(self, zone_id: str, event_type: str, data: Dict, ts: Optional[datetime] = None, qos: int = 0):
+        """Publish irrigation lifecycle event to MQTT right away (QoS 0 by default)"""
         if not self.mqtt_client:
             return
         
-        topic = f"irrigation/events/{zone_id}/{event_type}"
-        payload = {
+        self._enqueue(self._topic("events", zone_id, event_type), {
             "zone_id": zone_id,
             "event": event_type,
             "data": data,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        
+            "timestamp": ts or datetime.now(timezone.utc)
+        }, qos, realtime=True)
+    
+    def _topic(self, *parts: str) -> str:
+        """Return the cached irrigation/... topic string for the given parts"""
+        topic = self._topic_cache.get(parts)
+        if topic is None:
+            topic = self._topic_cache[parts] = "irrigation/" + "/".join(parts)
+        return topic
+    
+    def _enqueue(self, topic: str, payload: Dict, qos: int = 0, realtime: bool = False):
+        """Buffer an event while an execution is running, otherwise publish it now"""
+        with self._pending_lock:
+            if self._batching:
+                if not realtime:
+                    if self.granular_events:
+                        self._pending_events.append((topic, payload, qos))
+                    return
+                
+                # Send what is buffered ahead of it first so subscribers see events in order
+                events = self._pending_events
+                self._pending_events = []
+                for event in events:
+                    self._publish_event(*event)
+                self._publish_event(topic, payload, qos)
+                return
+        
+        self._publish_event(topic, payload, qos)
+    
+    def _publish_event(self, topic: str, payload: Dict, qos: int = 0):
+        """Publish a single event payload to MQTT"""
         try:
-            result = self.mqtt_client.publish(topic, json.dumps(payload), qos=1)
-            if hasattr(result, 'rc') and result.rc == 0:
-                logger.debug(f"📤 Published irrigation event: {zone_id}/{event_type}")
+            result = self.mqtt_client.publish(topic, _dumps(payload), qos=qos)
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                logger.debug("📤 Published event: {}", topic)
         except Exception as e:
-            logger.error(f"❌ Error publishing irrigation event: {e}")
+            logger.error(f"❌ Error publishing event to {topic}: {e}")
+    
+    def _flush_events(self, summary: Optional[Dict] = None):
+        """Publish all buffered events, plus the fused per-execution summary"""
+        with self._pending_lock:
+            events = self._pending_events
+            self._pending_events = []
+            self._batching = False
+        
+        if not self.mqtt_client or not (events or summary):
+            return
+        
+        # Per-topic publishes for realtime subscribers
+        for topic, payload, qos in events:
+            self._publish_event(topic, payload, qos)
+        
+        # One message grouped by zone for consumers that want the whole execution
+        if summary:
+            self._publish_event("irrigation/job/summary", summary, qos=0)
     
     def get_status(self) -> Dict:
         """Get current job status"""
@@ -3,7 +3,8 @@ Irrigation recommendation and prediction engine
 """
 
 import json
-from datetime import datetime, timezone, timedelta
+import time
+from datetime import datetime, timezone
 from loguru import logger
 import paho.mqtt.client as mqtt
 
@@ -18,9 +19,15 @@ class IrrigationController:
         self.db = db_manager
         self.analyzer = soil_analyzer
         self.mqtt_client = mqtt_client  # Reuse existing MQTT client
-        self.last_irrigation = {}  # Track last irrigation per zone
+        self.last_irrigation = {}  # Track last irrigation per zone (time.monotonic() seconds)
         self.iteration_counter = {}  # Track iterations per zone for forced irrigation
         
+        # Resolve irrigation settings once instead of on every decision
+        irrigation_config = (soil_analyzer.config or {}).get('irrigation', {})
+        self._min_interval_sec = irrigation_config.get('min_interval_hours', 6) * 3600.0
+        self._threshold_paw = irrigation_config.get('threshold_paw_percentage', 50)
+        self._app_rate_mm = irrigation_config.get('application_rate_mm', 10)
+        
         logger.info("🚿 Irrigation Controller initialized")
     
     def connect_mqtt(self):
@@ -67,12 +74,10 @@ class IrrigationController:
         
         # Check minimum interval
         if zone_id in self.last_irrigation:
-            time_since_last = datetime.now(timezone.utc) - self.last_irrigation[zone_id]
-            min_interval_hours = self.analyzer.config.get('irrigation', {}).get('min_interval_hours', 6)
-            min_interval = timedelta(hours=min_interval_hours)
+            seconds_since_last = time.monotonic() - self.last_irrigation[zone_id]
             
-            if time_since_last < min_interval:
-                hours_remaining = (min_interval - time_since_last).total_seconds() / 3600
+            if seconds_since_last < self._min_interval_sec:
+                hours_remaining = (self._min_interval_sec - seconds_since_last) / 3600
                 logger.info(f"⏳ {zone_id}: Too soon since last irrigation ({hours_remaining:.1f}h remaining)")
                 return False
         
@@ -106,8 +111,7 @@ class IrrigationController:
             if iteration % 3 == 0:
                 reason = f"Forced irrigation (iteration {iteration})"
             else:
-                threshold = self.analyzer.config.get('irrigation', {}).get('threshold_paw_percentage', 50)
-                reason = f"PAW below threshold ({threshold}%)"
+                reason = f"PAW below threshold ({self._threshold_paw}%)"
         
         self.db.store_irrigation_event(
             timestamp=timestamp,
@@ -118,7 +122,7 @@ class IrrigationController:
         )
         
         # Update last irrigation time
-        self.last_irrigation[zone_id] = timestamp
+        self.last_irrigation[zone_id] = time.monotonic()
         
         logger.info(f"📊 {zone_id} irrigation stats: Total iterations={self.iteration_counter.get(zone_id, 0)}")
     
@@ -144,8 +148,7 @@ class IrrigationController:
         
         # Check if automated irrigation should trigger
         if self.should_irrigate(zone_id, analysis):
-            recommended_amount = analysis.get('recommended_amount_mm', 
-                                             self.analyzer.config.get('irrigation', {}).get('application_rate_mm', 10))
+            recommended_amount = analysis.get('recommended_amount_mm', self._app_rate_mm)
             self.trigger_irrigation(
                 zone_id=zone_id,
                 amount_mm=recommended_amount,
@@ -1,15 +1,45 @@
 import os
+import sys
 import json
-import yaml
+import time
+import queue
+import threading
 from datetime import datetime, timezone
 import paho.mqtt.client as mqtt
 from loguru import logger
 from src.data_storage import DatabaseManager
+from _yaml_cache import load_yaml_cached
+
+# Sensor payload decoder: both accept the raw bytes, orjson skips the str copy
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+_FROM_ISO = datetime.fromisoformat
+
+# Sensor rows are written in batches of up to this many rows, at most this long after the first
+_FLUSH_ROWS = 500
+_FLUSH_INTERVAL_SEC = 0.1
+
+
+def _make_on_message(put_nowait, on_full):
+    """Build the paho on_message callback with its hot-path targets bound as closure locals"""
+    def on_message(client, userdata, msg):
+        try:
+            put_nowait(msg)
+        except queue.Full:
+            on_full(msg)
+    return on_message
 
 
 class SensorDataCollector:
     """MQTT client for collecting sensor data"""
     
+    __slots__ = ('broker', 'port', 'topics', 'client_id', 'custom_callback', 'db', 'client', 'connected',
+                 '_inbox', '_consumer', 'dropped_messages', '_rows', '_topic_suffix_cache')
+    
     def __init__(self, broker=None, port=None, topics=None, on_message_callback=None, config_path="config/mqtt_config.yaml", db_manager=None):
         """Initialize MQTT client"""
         
@@ -17,22 +47,33 @@ class SensorDataCollector:
             self.broker = broker
             self.port = port
             self.topics = topics
-            self.custom_callback = on_message_callback
             self.client_id = "irrigation_collector"
         else:
             self.load_config(config_path)
-            self.custom_callback = None
+        
+        # Runs on the consumer thread in place of the default parse-and-store handling
+        self.custom_callback = on_message_callback
         
         self.db = db_manager or DatabaseManager()
         self.client = None
         self.connected = False
         
+        # Messages are decoded and stored on a consumer thread, not paho's network thread
+        self._inbox: queue.Queue = queue.Queue(maxsize=10_000)
+        self._consumer: threading.Thread = None
+        self.dropped_messages = 0
+        
+        # sensor_readings rows awaiting the next batched INSERT (consumer thread only)
+        self._rows: list = []
+        
+        # topic -> interned sensor_type (last path segment); the topic set is small and fixed
+        self._topic_suffix_cache: dict = {}
+        
         logger.info("📡 Sensor Data Collector initialized")
     
     def load_config(self, config_path):
         """Load MQTT configuration"""
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_yaml_cached(config_path)
         
         self.broker = os.getenv('MQTT_BROKER', config['mqtt']['broker'])
         self.port = int(os.getenv('MQTT_PORT', config['mqtt']['port']))
@@ -60,53 +101,141 @@ class SensorDataCollector:
             logger.error(f"❌ Connection failed, return code {rc}")
             self.connected = False
     
-    def on_message(self, client, userdata, msg):
-        """Handle incoming sensor messages"""
-        logger.debug(f"📨 Raw message received on {msg.topic}")
+    def _on_inbox_full(self, msg):
+        """Drop a message the consumer has no room for (blocking would stall MQTT keepalives)"""
+        self.dropped_messages += 1
+        if self.dropped_messages == 1 or self.dropped_messages % 1000 == 0:
+            logger.warning(f"⚠️  Sensor inbox full, dropped {self.dropped_messages} message(s) so far "
+                           f"(latest on {msg.topic})")
+    
+    def _consume(self):
+        """Drain queued sensor messages into batched inserts until stop() enqueues the None sentinel"""
+        rows = self._rows
+        flush_at = 0.0
+        
+        while True:
+            timeout = max(0.0, flush_at - time.monotonic()) if rows else None
+            try:
+                msg = self._inbox.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_rows(rows)
+                continue
+            
+            if msg is None:
+                break
+            
+            pending = len(rows)
+            self._handle_message(msg)
+            
+            if rows and not pending:
+                flush_at = time.monotonic() + _FLUSH_INTERVAL_SEC
+            if len(rows) >= _FLUSH_ROWS:
+                self._flush_rows(rows)
+        
+        self._flush_rows(rows)
+    
+    def _handle_message(self, msg):
+        """Consumer thread: hand the message to the custom callback, or parse and buffer it"""
+        if self.custom_callback is not None:
+            try:
+                self.custom_callback(self.client, None, msg)
+            except Exception as e:
+                logger.exception(f"❌ Error in message handler for {msg.topic}: {e}")
+            return
+        
+        row = self._parse_message(msg)
+        if row is not None:
+            self._rows.append(row)
+    
+    def buffer_reading(self, timestamp, zone_id, sensor_type, value, unit, depth_cm=None):
+        """Queue a sensor reading for the next batched INSERT (call from the message callback)"""
+        if zone_id is None or value is None or unit is None:
+            logger.warning(f"⚠️  Dropping {sensor_type} reading: missing zone_id, value or unit")
+            return
         
-        # If custom callback is set, use it
-        if self.custom_callback:
-            self.custom_callback(client, userdata, msg)
+        self._rows.append({
+            'timestamp': timestamp,
+            'zone_id': zone_id,
+            'sensor_type': sensor_type,
+            'value': value,
+            'unit': unit,
+            'depth_cm': depth_cm
+        })
+    
+    def _flush_rows(self, rows):
+        """Write buffered sensor rows in one INSERT and clear the buffer"""
+        if not rows:
             return
         
-        # Default behavior - store in database
+        if self.db.store_sensor_readings_batch(rows):
+            logger.debug(f"💾 Flushed {len(rows)} sensor reading(s)")
+        elif len(rows) > 1:
+            # One bad row rolls back the whole INSERT; retry row by row so only it is lost
+            logger.warning(f"⚠️  Batch of {len(rows)} sensor readings failed, retrying individually")
+            stored = sum(1 for row in rows if self.db.store_sensor_readings_batch([row]))
+            logger.info(f"💾 Stored {stored}/{len(rows)} sensor reading(s) individually")
+        rows.clear()
+    
+    def _parse_message(self, msg):
+        """Decode a sensor message into a sensor_readings row (None if it is malformed)"""
         try:
-            payload = json.loads(msg.payload.decode())
+            payload = _loads(msg.payload)
             timestamp_str = payload.get('timestamp')
-            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+            # Python 3.10's fromisoformat rejects 'Z'; only rebuild the string when it's there
+            timestamp = _FROM_ISO(timestamp_str[:-1] + '+00:00' if timestamp_str.endswith('Z') else timestamp_str)
             
             zone_id = payload.get('zone_id')
+            if isinstance(zone_id, str):
+                zone_id = sys.intern(zone_id)
             value = payload.get('value')
             unit = payload.get('unit')
             depth_cm = payload.get('depth_cm')
-            sensor_type = msg.topic.split('/')[-1]
             
-            self.db.store_sensor_reading(
-                timestamp=timestamp,
-                zone_id=zone_id,
-                sensor_type=sensor_type,
-                value=value,
-                unit=unit,
-                depth_cm=depth_cm
-            )
+            # NOT NULL columns: a missing one would fail the whole batched INSERT
+            if zone_id is None or value is None or unit is None:
+                logger.warning(f"⚠️  Dropping reading from {msg.topic}: missing zone_id, value or unit")
+                return None
+            
+            topic = msg.topic
+            sensor_type = self._topic_suffix_cache.get(topic)
+            if sensor_type is None:
+                sensor_type = self._topic_suffix_cache[topic] = sys.intern(topic.rpartition('/')[2])
             
             logger.debug(f"📥 {sensor_type} from {zone_id}: {value}{unit}")
             
+            return {
+                'timestamp': timestamp,
+                'zone_id': zone_id,
+                'sensor_type': sensor_type,
+                'value': value,
+                'unit': unit,
+                'depth_cm': depth_cm
+            }
+            
         except Exception as e:
             logger.error(f"Error processing message: {e}")
             import traceback
             traceback.print_exc()
+            return None
     
     def connect(self):
         """Connect to MQTT broker"""
         # Create client with proper client_id and keepalive
         self.client = mqtt.Client(client_id=self.client_id, clean_session=True)
         self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
+        
+        self.client.on_message = _make_on_message(self._inbox.put_nowait, self._on_inbox_full)
         
         # Enable reconnection
         self.client.reconnect_delay_set(min_delay=1, max_delay=120)
         
+        # Wide inflight window so publish bursts don't stall waiting on acknowledgements
+        self.client.max_inflight_messages_set(1000)
+        
+        if self._consumer is None or not self._consumer.is_alive():
+            self._consumer = threading.Thread(target=self._consume, daemon=True, name='mqtt-consumer')
+            self._consumer.start()
+        
         try:
             logger.info(f"🔌 Connecting to {self.broker}:{self.port}...")
             self.client.connect(self.broker, self.port, keepalive=60)
@@ -126,6 +255,11 @@ class SensorDataCollector:
         if self.client:
             self.client.loop_stop()
             self.client.disconnect()
+        
+        # Let the consumer finish what is already queued
+        if self._consumer is not None and self._consumer.is_alive():
+            self._inbox.put(None)
+            self._consumer.join(timeout=5)
         logger.info("⏹️  MQTT client stopped")
     
     def disconnect(self):
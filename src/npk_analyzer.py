@@ -1,12 +1,37 @@
 
-import yaml
 from datetime import datetime, timezone, timedelta
+import numpy as np
 from loguru import logger
 
+from _yaml_cache import load_yaml_cached
+
+_NUTRIENTS = ('nitrogen', 'phosphorus', 'potassium')
+_SYMBOLS = ('N', 'P', 'K')
+_STATUSES = ('CRITICAL', 'LOW', 'DEFICIENT', 'OPTIMAL', 'EXCESS')
+
+# Crop minimum when the crop has no requirement, and mg/kg deficit per application-rate step
+_DEFAULT_CROP_MIN = (80, 30, 150)
+_RATE_SCALE = np.array([20, 10, 50], dtype=np.float64)
+
+
+def _threshold_bounds(thresholds):
+    """
+    Sorted bounds so that searchsorted(bounds, value, side='right') indexes _STATUSES.
+    optimal_max is inclusive, so its bound is the next float above it.
+    """
+    return np.array([
+        thresholds.get('critical_low', 0),
+        thresholds.get('low', 0),
+        thresholds.get('optimal_min', 0),
+        np.nextafter(float(thresholds.get('optimal_max', 999)), np.inf)
+    ], dtype=np.float64)
+
 
 class NPKAnalyzer:
     """Analyze NPK nutrient levels and recommend fertilization"""
     
+    __slots__ = ('db', 'config', '_thresh', '_crop_index', '_crop_min', '_rates')
+    
     def __init__(self, config_path='config/npk_config.yaml', db_manager=None):
         self.db = db_manager
         self.load_config(config_path)
@@ -14,8 +39,7 @@ class NPKAnalyzer:
     
     def load_config(self, config_path):
         try:
-            with open(config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
+            self.config = load_yaml_cached(config_path)
             logger.info("✅ NPK configuration loaded")
         except Exception as e:
             logger.error(f"Failed to load NPK config: {e}")
@@ -27,98 +51,109 @@ class NPKAnalyzer:
                     'potassium': {'critical_low': 50, 'low': 100, 'optimal_min': 150, 'optimal_max': 300}
                 }
             }
+        
+        self._build_lookup_arrays()
     
     def analyze_nutrient(self, nutrient_name, value):
-        thresholds = self.config['npk_thresholds'].get(nutrient_name.lower(), {})
-        
-        status = 'UNKNOWN'
-        if value < thresholds.get('critical_low', 0):
-            status = 'CRITICAL'
-        elif value < thresholds.get('low', 0):
-            status = 'LOW'
-        elif value < thresholds.get('optimal_min', 0):
-            status = 'DEFICIENT'
-        elif value <= thresholds.get('optimal_max', 999):
-            status = 'OPTIMAL'
-        else:
-            status = 'EXCESS'
+        name = nutrient_name.lower()
+        bounds = self._thresh.get(name)
+        if bounds is None:
+            bounds = _threshold_bounds({})
         
         return {
             'nutrient': nutrient_name.upper(),
             'value': value,
-            'status': status,
-            'thresholds': thresholds
+            'status': _STATUSES[int(np.searchsorted(bounds, value, side='right'))],
+            'thresholds': self.config['npk_thresholds'].get(name, {})
         }
     
     def analyze_npk(self, zone_id, nitrogen, phosphorus, potassium, crop_type='wheat'):
+        return self.analyze_npk_batch([zone_id], [nitrogen], [phosphorus], [potassium], [crop_type])[0]
+    
+    def analyze_npk_batch(self, zone_ids, nitrogen, phosphorus, potassium, crop_types):
+        """Analyze many zones at once; inputs are aligned sequences, one entry per zone"""
+        inputs = (nitrogen, phosphorus, potassium)
+        values = np.column_stack(inputs).astype(np.float64)
         
-        # Analyze each nutrient
-        n_analysis = self.analyze_nutrient('nitrogen', nitrogen)
-        p_analysis = self.analyze_nutrient('phosphorus', phosphorus)
-        k_analysis = self.analyze_nutrient('potassium', potassium)
+        # Status index per nutrient: number of threshold bounds <= value
+        status_idx = np.empty(values.shape, dtype=np.intp)
+        for j, name in enumerate(_NUTRIENTS):
+            status_idx[:, j] = np.searchsorted(self._thresh[name], values[:, j], side='right')
         
-        # Get crop requirements
-        crop_req = self.config.get('crop_requirements', {}).get(crop_type, {})
+        # Deficit against the crop minimum (unknown crops use the default row)
+        default_row = len(self._crop_index)
+        crop_rows = np.fromiter(
+            (self._crop_index.get(crop, default_row) for crop in crop_types),
+            dtype=np.intp, count=len(zone_ids)
+        )
+        deficits = self._crop_min[crop_rows] - values
+        needs = (status_idx <= 2) & (deficits > 0)
         
-        # Determine fertilization needs
-        fertilization_needed = False
-        recommendations = []
+        if needs.any():
+            if self._rates is None:
+                raise KeyError('fertilizer_application')
+            amounts = deficits / _RATE_SCALE * self._rates
         
-        # Nitrogen
-        if n_analysis['status'] in ['CRITICAL', 'LOW', 'DEFICIENT']:
-            n_deficit = crop_req.get('N', {}).get('min', 80) - nitrogen
-            if n_deficit > 0:
-                n_amount = (n_deficit / 20) * self.config['fertilizer_application']['N_deficit_rate_kg_per_ha']
-                recommendations.append({
-                    'nutrient': 'N',
-                    'amount_kg_per_ha': round(n_amount, 1),
-                    'reason': f'Nitrogen deficit: {n_deficit:.1f} mg/kg below optimal'
-                })
-                fertilization_needed = True
+        min_idx = status_idx.min(axis=1)
+        max_idx = status_idx.max(axis=1)
+        overall = np.select(
+            [min_idx == 0, min_idx <= 2, max_idx == 4],
+            ['CRITICAL', 'DEFICIENT', 'EXCESS'],
+            default='OPTIMAL'
+        )
         
-        # Phosphorus
-        if p_analysis['status'] in ['CRITICAL', 'LOW', 'DEFICIENT']:
-            p_deficit = crop_req.get('P', {}).get('min', 30) - phosphorus
-            if p_deficit > 0:
-                p_amount = (p_deficit / 10) * self.config['fertilizer_application']['P_deficit_rate_kg_per_ha']
-                recommendations.append({
-                    'nutrient': 'P',
-                    'amount_kg_per_ha': round(p_amount, 1),
-                    'reason': f'Phosphorus deficit: {p_deficit:.1f} mg/kg below optimal'
-                })
-                fertilization_needed = True
+        thresholds = [self.config['npk_thresholds'].get(name, {}) for name in _NUTRIENTS]
+        status_rows = status_idx.tolist()
         
-        # Potassium
-        if k_analysis['status'] in ['CRITICAL', 'LOW', 'DEFICIENT']:
-            k_deficit = crop_req.get('K', {}).get('min', 150) - potassium
-            if k_deficit > 0:
-                k_amount = (k_deficit / 50) * self.config['fertilizer_application']['K_deficit_rate_kg_per_ha']
+        results = []
+        for i, zone_id in enumerate(zone_ids):
+            analyses = [
+                {
+                    'nutrient': name.upper(),
+                    'value': inputs[j][i],
+                    'status': _STATUSES[status_rows[i][j]],
+                    'thresholds': thresholds[j]
+                }
+                for j, name in enumerate(_NUTRIENTS)
+            ]
+            
+            # Only zones with a deficient nutrient get recommendation dicts
+            recommendations = []
+            for j in np.flatnonzero(needs[i]):
                 recommendations.append({
-                    'nutrient': 'K',
-                    'amount_kg_per_ha': round(k_amount, 1),
-                    'reason': f'Potassium deficit: {k_deficit:.1f} mg/kg below optimal'
+                    'nutrient': _SYMBOLS[j],
+                    'amount_kg_per_ha': round(float(amounts[i, j]), 1),
+                    'reason': f'{_NUTRIENTS[j].capitalize()} deficit: {deficits[i, j]:.1f} mg/kg below optimal'
                 })
-                fertilization_needed = True
+            
+            results.append({
+                'zone_id': zone_id,
+                'crop_type': crop_types[i],
+                'nitrogen': analyses[0],
+                'phosphorus': analyses[1],
+                'potassium': analyses[2],
+                'fertilization_needed': bool(recommendations),
+                'recommendations': recommendations,
+                'overall_status': str(overall[i])
+            })
         
-        return {
-            'zone_id': zone_id,
-            'crop_type': crop_type,
-            'nitrogen': n_analysis,
-            'phosphorus': p_analysis,
-            'potassium': k_analysis,
-            'fertilization_needed': fertilization_needed,
-            'recommendations': recommendations,
-            'overall_status': self._get_overall_status([n_analysis, p_analysis, k_analysis])
-        }
+        return results
     
-    def _get_overall_status(self, analyses):
-        statuses = [a['status'] for a in analyses]
+    def _build_lookup_arrays(self):
+        """Flatten thresholds and crop minimums into searchsorted/lookup arrays"""
+        thresholds = self.config['npk_thresholds']
+        self._thresh = {name: _threshold_bounds(thresholds.get(name, {})) for name in _NUTRIENTS}
+        self._thresh.update({name: _threshold_bounds(t) for name, t in thresholds.items() if name not in self._thresh})
+        
+        crops = self.config.get('crop_requirements', {})
+        self._crop_index = {crop: i for i, crop in enumerate(crops)}
+        self._crop_min = np.array([
+            [req.get(symbol, {}).get('min', default) for symbol, default in zip(_SYMBOLS, _DEFAULT_CROP_MIN)]
+            for req in crops.values()
+        ] + [list(_DEFAULT_CROP_MIN)], dtype=np.float64)
         
-        if 'CRITICAL' in statuses:
-            return 'CRITICAL'
-        elif 'LOW' in statuses or 'DEFICIENT' in statuses:
-            return 'DEFICIENT'
-        elif 'EXCESS' in statuses:
-            return 'EXCESS'
-        else:
-            return 'OPTIMAL'
+        # kg/ha per _RATE_SCALE step of deficit, resolved once instead of per analysis
+        application = self.config.get('fertilizer_application')
+        self._rates = np.array([
+            application[f'{symbol}_deficit_rate_kg_per_ha'] for symbol in _SYMBOLS
+        ], dtype=np.float64) if application else None
@@ -1,23 +1,214 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import requests
-import json
-from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from typing import Dict, List, Optional
+import numpy as np
 from loguru import logger
 from datetime import datetime
 
+# Amount/reason rules are shared with the ML service so both backends agree
+from ml.pump_rules import calculate_amount, generate_reason
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Pure-Python fallback: same kernels, interpreted
+    prange = range
+    
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+# Mock model in fixed point: readings that are whole tenths (moisture 34.5% -> 345) are
+# stored as int16 and scored in integer arithmetic (machine-width ints, not int16).
+# Component scores use a /1000 scale.
+# The weights 0.4/0.2/0.2/0.2 are exactly 2:1:1:1 over 5, so the weighted score is an
+# integer numerator over _SCORE_DEN. Finer readings keep the float model, since rounding
+# them to tenths would shift confidence in the third decimal.
+_Q = 10
+_SCORE_DEN = 5000
+_AMOUNT_DEN = 1000  # recommended amount in thousandths of a mm
+
+
+def _quantize(value: float) -> int:
+    """Scale a reading to int16 tenths"""
+    return max(-32768, min(32767, int(round(value * _Q))))
+
+
+@njit(cache=True, fastmath=True)
+def _score_kernel(moisture_q, temperature_q, humidity_q, rainfall_q, npk_low_flag):
+    """Integer mock model: (should_irrigate, score numerator / _SCORE_DEN, amount / _AMOUNT_DEN mm)"""
+    moisture_score = 1000 - moisture_q  # Higher score for lower moisture
+    temp_score = max(0, temperature_q - 250) * 5  # Higher score for higher temp
+    humidity_score = 1000 - humidity_q  # Higher score for lower humidity
+    rainfall_score = max(0, 100 - rainfall_q) * 10  # Lower score if recent rain
+    
+    # Weighted decision: (2*m + t + h + r) / 5 on the /1000 scale
+    score = 2 * moisture_score + temp_score + humidity_score + rainfall_score
+    should_irrigate = 2 * score > _SCORE_DEN
+    
+    # Calculate recommended amount: 10mm * (1 + moisture_score), 80% if nutrients are low
+    amount = 0
+    if should_irrigate:
+        amount = 10000 + 10 * moisture_score
+        if npk_low_flag:
+            amount = amount * 4 // 5
+    
+    return should_irrigate, score, amount
+
+
+# No fastmath here or in _score_kernel_batch (callees inherit the caller's flags): it lets
+# LLVM rewrite the divisions as reciprocal multiplies, which moves rounded amounts by 0.01
+@njit(cache=True)
+def _score_kernel_float(moisture, temperature, humidity, rainfall, npk_low_flag):
+    """Float mock model for readings finer than tenths: (should_irrigate, irrigation_score, amount mm)"""
+    moisture_score = (100.0 - moisture) / 100.0  # Higher score for lower moisture
+    temp_score = max(0.0, (temperature - 25.0) / 20.0)  # Higher score for higher temp
+    humidity_score = (100.0 - humidity) / 100.0  # Higher score for lower humidity
+    rainfall_score = max(0.0, (10.0 - rainfall) / 10.0)  # Lower score if recent rain
+    
+    # Weighted decision
+    irrigation_score = (
+        moisture_score * 0.4 +
+        temp_score * 0.2 +
+        humidity_score * 0.2 +
+        rainfall_score * 0.2
+    )
+    should_irrigate = irrigation_score > 0.5
+    
+    # Calculate recommended amount, reduced if nutrients are low
+    amount = 0.0
+    if should_irrigate:
+        amount = 10.0 * (1.0 + moisture_score)
+        if npk_low_flag:
+            amount *= 0.8
+    
+    return should_irrigate, irrigation_score, amount
+
+
+@njit(cache=True, parallel=True)
+def _score_kernel_batch(moisture, temperature, humidity, rainfall,
+                        moisture_q, temperature_q, humidity_q, rainfall_q, in_tenths, npk_low_flag):
+    """
+    Score per-zone arrays: the integer kernel where in_tenths, else the float kernel.
+    Integer rows hold the raw numerators; the caller divides them (exact IEEE division).
+    """
+    n = moisture.shape[0]
+    should_irrigate = np.empty(n, dtype=np.bool_)
+    score = np.empty(n, dtype=np.float64)
+    amount = np.empty(n, dtype=np.float64)
+    
+    for i in prange(n):
+        if in_tenths[i]:
+            should_irrigate[i], score[i], amount[i] = _score_kernel(
+                int(moisture_q[i]), int(temperature_q[i]), int(humidity_q[i]), int(rainfall_q[i]),
+                npk_low_flag[i]
+            )
+        else:
+            should_irrigate[i], score[i], amount[i] = _score_kernel_float(
+                moisture[i], temperature[i], humidity[i], rainfall[i], npk_low_flag[i]
+            )
+    
+    return should_irrigate, score, amount
+
+
+# In-process model inputs, in training order: (metric keys tried in order, default)
+_ONNX_FEATURES = (
+    (('temperature_celsius', 'Temperature'), 25.0),
+    (('humidity_percent', 'Humidity'), 60.0),
+    (('water_level', 'moisture_percent', 'water_level_percent'), 50.0),
+    (('nitrogen_mgkg', 'N'), 50.0),
+    (('phosphorus_mgkg', 'P'), 30.0),
+    (('potassium_mgkg', 'K'), 150.0),
+)
+
+
+def _feature(metrics: Dict, keys: tuple, default: float) -> float:
+    for key in keys:
+        value = metrics.get(key)
+        if value is not None:
+            return value
+    return default
+
+
+def _decision_from_probability(probability: float, features) -> Dict:
+    """Turn a pump-activation probability into the ML service's response shape"""
+    temperature, humidity, water_level, nitrogen, phosphorus, potassium = (float(f) for f in features)
+    should_irrigate = probability > 0.5
+    
+    amount = calculate_amount(probability, water_level, temperature, humidity)
+    reason = generate_reason(should_irrigate, probability, water_level, temperature, humidity,
+                             nitrogen, phosphorus, potassium, model_name="ONNX")
+    
+    return {
+        'should_irrigate': should_irrigate,
+        'confidence': round(abs(probability - 0.5) * 2, 3),
+        'probability': round(probability, 3),
+        'recommended_amount_mm': round(amount, 2),
+        'reason': reason,
+        'model_version': 'onnx-v1.0'
+    }
+
 
 class PumpModelClient:
     """Client for ML-based irrigation decision service"""
     
-    def __init__(self, model_url: str, timeout: int = 10):
+    __slots__ = ('backend', 'model_url', 'batch_url', 'timeout', 'max_batch', 'max_delay_ms',
+                 '_session', '_headers', '_queue', '_batch_thread',
+                 'model_path', '_session_ort', '_input_name', '_in', '_in_lock')
+    
+    def __init__(self, model_url: str, timeout: int = 10,
+                 batch_url: Optional[str] = None,
+                 max_batch: int = 16,
+                 max_delay_ms: float = 20.0,
+                 backend: str = 'http',
+                 model_path: Optional[str] = None):
         """
         Initialize ML Model Client
         
         Args:
             model_url: URL of the ML model service (e.g., http://ml-service:5000/predict)
             timeout: Request timeout in seconds
+            batch_url: URL of the batch endpoint (defaults to model_url + '_batch')
+            max_batch: Maximum number of predictions coalesced into one request
+            max_delay_ms: How long the batcher waits for more requests before sending
+            backend: 'http' (ML service) or 'onnx' (in-process ONNX Runtime)
+            model_path: ONNX model file, required for the 'onnx' backend
         """
+        self.backend = backend
+        if backend == 'onnx':
+            self._init_onnx(model_path)
+            return
+        
         self.model_url = model_url
+        self.batch_url = batch_url or model_url.rstrip('/') + '_batch'
         self.timeout = timeout
+        self.max_batch = max_batch
+        self.max_delay_ms = max_delay_ms
+        
+        # Keep-alive connection pool reused across predictions
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._headers = {'Content-Type': 'application/json'}
+        
+        # Micro-batching: concurrent predict_irrigation calls share one HTTP request
+        self._queue: queue.Queue = queue.Queue()
+        self._batch_thread = threading.Thread(target=self._batch_loop, daemon=True, name='ml-batcher')
+        self._batch_thread.start()
+        
         logger.info(f"🤖 ML Model Client initialized: {model_url}")
     
     def predict_irrigation(self, metrics: Dict) -> Dict:
@@ -35,36 +226,136 @@ class PumpModelClient:
                 - reason: str
                 - model_version: str
         """
+        if self.backend == 'onnx':
+            return self._predict_onnx(metrics)
+        
+        future: Future = Future()
+        self._queue.put((metrics, future))
+        
+        try:
+            return future.result(timeout=self.timeout + self.max_delay_ms / 1000)
+        except FutureTimeoutError:
+            logger.error(f"⏱️  ML Model request timeout ({self.timeout}s)")
+            return self._fallback_decision(metrics)
+    
+    def predict_irrigation_batch(self, metrics_list: List[Dict]) -> List[Dict]:
+        """
+        Send several zones' metrics in one request and get their decisions
+        
+        Args:
+            metrics_list: List of metrics dictionaries
+            
+        Returns:
+            List of decision dictionaries, in the same order as metrics_list
+        """
+        if self.backend == 'onnx':
+            return self._predict_onnx_batch(metrics_list)
+        
         try:
-            logger.debug(f"📤 Sending metrics to ML model: {metrics}")
+            logger.debug(f"📤 Sending {len(metrics_list)} metrics set(s) to ML model")
             
-            response = requests.post(
-                self.model_url,
-                json=metrics,
+            response = self._session.post(
+                self.batch_url,
+                data=orjson.dumps(metrics_list),
                 timeout=self.timeout,
-                headers={'Content-Type': 'application/json'}
+                headers=self._headers
             )
             
             if response.status_code == 200:
-                result = response.json()
-                logger.info(f"✅ ML Model Response: irrigate={result.get('should_irrigate')}, "
-                          f"confidence={result.get('confidence', 0):.2f}, "
-                          f"amount={result.get('recommended_amount_mm', 0)}mm")
-                return result
+                results = orjson.loads(response.content)
+                if len(results) != len(metrics_list):
+                    logger.error(f"❌ ML Model returned {len(results)} decisions for {len(metrics_list)} requests")
+                    return [self._fallback_decision(metrics) for metrics in metrics_list]
+                
+                for result in results:
+                    logger.info(f"✅ ML Model Response: irrigate={result.get('should_irrigate')}, "
+                              f"confidence={result.get('confidence', 0):.2f}, "
+                              f"amount={result.get('recommended_amount_mm', 0)}mm")
+                return results
             else:
                 logger.error(f"❌ ML Model error: {response.status_code} - {response.text}")
-                return self._fallback_decision(metrics)
                 
         except requests.exceptions.Timeout:
             logger.error(f"⏱️  ML Model request timeout ({self.timeout}s)")
-            return self._fallback_decision(metrics)
         except requests.exceptions.ConnectionError:
-            logger.error(f"🔌 Cannot connect to ML Model service at {self.model_url}")
-            return self._fallback_decision(metrics)
+            logger.error(f"🔌 Cannot connect to ML Model service at {self.batch_url}")
         except Exception as e:
             logger.error(f"❌ ML Model prediction error: {e}")
+        
+        return [self._fallback_decision(metrics) for metrics in metrics_list]
+    
+    def _batch_loop(self):
+        """Coalesce queued predictions arriving within max_delay_ms into one request"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay_ms / 1000
+            
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            results = self.predict_irrigation_batch([metrics for metrics, _ in batch])
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+    
+    def _init_onnx(self, model_path: Optional[str]):
+        """Load the exported pump model once into an ONNX Runtime session"""
+        import onnxruntime as ort
+        
+        if not model_path:
+            raise ValueError("model_path is required for the 'onnx' backend")
+        
+        self.model_path = model_path
+        self._session_ort = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self._input_name = self._session_ort.get_inputs()[0].name
+        
+        # Reused single-row input, columns in _ONNX_FEATURES order (zones predict concurrently)
+        self._in = np.zeros((1, len(_ONNX_FEATURES)), dtype=np.float32)
+        self._in_lock = threading.Lock()
+        
+        logger.info(f"🤖 ML Model Client initialized: ONNX Runtime ({model_path})")
+    
+    def _predict_onnx(self, metrics: Dict) -> Dict:
+        """Run the in-process model for one zone"""
+        try:
+            with self._in_lock:
+                row = self._in[0]
+                for i, (keys, default) in enumerate(_ONNX_FEATURES):
+                    row[i] = _feature(metrics, keys, default)
+                
+                probability = self._onnx_probabilities(self._in)[0]
+                features = row.tolist()
+            
+            return _decision_from_probability(probability, features)
+        except Exception as e:
+            logger.error(f"❌ ONNX model prediction error: {e}")
             return self._fallback_decision(metrics)
     
+    def _predict_onnx_batch(self, metrics_list: List[Dict]) -> List[Dict]:
+        """Run the in-process model for many zones in one session call"""
+        try:
+            features = np.array([
+                [_feature(metrics, keys, default) for keys, default in _ONNX_FEATURES]
+                for metrics in metrics_list
+            ], dtype=np.float32)
+            
+            probabilities = self._onnx_probabilities(features)
+            return [_decision_from_probability(p, row) for p, row in zip(probabilities, features)]
+        except Exception as e:
+            logger.error(f"❌ ONNX model prediction error: {e}")
+            return [self._fallback_decision(metrics) for metrics in metrics_list]
+    
+    def _onnx_probabilities(self, features: np.ndarray) -> List[float]:
+        """Probability of class 1 (activate pump) per input row"""
+        outputs = self._session_ort.run(None, {self._input_name: features})
+        # Classifier exports emit (label, probabilities); rows are arrays or {class: p} maps
+        return [float(row[1]) for row in outputs[-1]]
+    
     def _fallback_decision(self, metrics: Dict) -> Dict:
         """
         Fallback rule-based decision if ML model is unavailable
@@ -126,33 +417,17 @@ class MockMLModelService:
         rainfall = metrics.get('rainfall_mm_24h', 0)
         npk_status = metrics.get('npk_status', 'OPTIMAL')
         
-        # Calculate weighted score
-        moisture_score = (100 - moisture) / 100  # Higher score for lower moisture
-        temp_score = max(0, (temperature - 25) / 20)  # Higher score for higher temp
-        humidity_score = (100 - humidity) / 100  # Higher score for lower humidity
-        rainfall_score = max(0, (10 - rainfall) / 10)  # Lower score if recent rain
-        
-        # Weighted decision
-        irrigation_score = (
-            moisture_score * 0.4 +
-            temp_score * 0.2 +
-            humidity_score * 0.2 +
-            rainfall_score * 0.2
-        )
-        
-        should_irrigate = irrigation_score > 0.5
-        confidence = min(irrigation_score, 1.0)
-        
-        # Calculate recommended amount
-        if should_irrigate:
-            base_amount = 10.0
-            amount = base_amount * (1 + moisture_score)
-            
-            # Adjust for NPK
-            if npk_status in ['CRITICAL', 'LOW']:
-                amount *= 0.8  # Reduce water if nutrients are low
+        npk_low = npk_status in ('CRITICAL', 'LOW')
+        quantized = (_quantize(moisture), _quantize(temperature), _quantize(humidity), _quantize(rainfall))
+        if quantized == (moisture * _Q, temperature * _Q, humidity * _Q, rainfall * _Q):
+            should_irrigate, score, amount = _score_kernel(*quantized, npk_low)
+            irrigation_score = score / _SCORE_DEN
+            amount_mm = amount / _AMOUNT_DEN
         else:
-            amount = 0.0
+            should_irrigate, irrigation_score, amount_mm = _score_kernel_float(
+                moisture, temperature, humidity, rainfall, npk_low
+            )
+        confidence = min(irrigation_score, 1.0)
         
         # Reason
         reasons = []
@@ -168,10 +443,30 @@ class MockMLModelService:
         reason = ", ".join(reasons) if reasons else "Conditions optimal"
         
         return {
-            'should_irrigate': should_irrigate,
+            'should_irrigate': bool(should_irrigate),
             'confidence': round(confidence, 3),
-            'recommended_amount_mm': round(amount, 2),
+            'recommended_amount_mm': round(amount_mm, 2),
             'reason': reason,
             'model_version': 'mock-ml-v1.0',
             'irrigation_score': round(irrigation_score, 3)
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def score_batch(moisture, temperature, humidity, rainfall, npk_low_flag):
+        """
+        Score many zones at once (arrays aligned by zone)
+        
+        Returns:
+            Tuple of arrays: (should_irrigate, confidence, amount_mm, irrigation_score)
+        """
+        readings = [np.asarray(x, dtype=np.float64) for x in (moisture, temperature, humidity, rainfall)]
+        quantized = [np.clip(np.rint(x * _Q), -32768, 32767) for x in readings]
+        in_tenths = np.logical_and.reduce([q == x * _Q for q, x in zip(quantized, readings)])
+        
+        should_irrigate, score, amount = _score_kernel_batch(
+            *readings, *(q.astype(np.int16) for q in quantized), in_tenths,
+            np.asarray(npk_low_flag, dtype=np.bool_)
+        )
+        irrigation_score = np.where(in_tenths, score / _SCORE_DEN, score)
+        amount_mm = np.where(in_tenths, amount / _AMOUNT_DEN, amount)
+        return should_irrigate, np.minimum(irrigation_score, 1.0), amount_mm, irrigation_score
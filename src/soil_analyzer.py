@@ -1,60 +1,53 @@
-from datetime import datetime, timedelta, timezone
+import time
+from bisect import bisect_right
 from loguru import logger
 
 class SoilAnalyzer:
+    __slots__ = ('config', 'db', 'last_irrigation', '_fc', '_wp', '_range',
+                 '_status_cut', '_status_names', '_min_interval_sec')
+    
     def __init__(self, soil_config, db_manager):
         self.config = soil_config
         self.db = db_manager
-        self.last_irrigation = {}
+        self.last_irrigation = {}  # time.monotonic() seconds per zone
+        
+        # Moisture model constants: field capacity, wilting point, PAW status cut-offs
+        self._fc, self._wp = 33.0, 12.0
+        self._range = self._fc - self._wp
+        self._status_cut = (30.0, 50.0, 70.0)
+        self._status_names = ('CRITICAL', 'LOW', 'ADEQUATE', 'OPTIMAL')
+        
+        irrigation_config = (soil_config or {}).get('irrigation', {})
+        self._min_interval_sec = irrigation_config.get('min_interval_hours', 6) * 3600.0
     
     def analyze_moisture(self, zone_id, current_moisture_pct):
-        field_capacity = 33.0
-        wilting_point = 12.0
-        
-        if current_moisture_pct <= wilting_point:
-            paw_pct = 0
-        elif current_moisture_pct >= field_capacity:
-            paw_pct = 100
-        else:
-            paw_pct = ((current_moisture_pct - wilting_point) / 
-                      (field_capacity - wilting_point)) * 100
-        
-        if paw_pct < 30:
-            status = "CRITICAL"
-        elif paw_pct < 50:
-            status = "LOW"
-        elif paw_pct < 70:
-            status = "ADEQUATE"
-        else:
-            status = "OPTIMAL"
+        # Plant-available water, clamped to 0-100%
+        paw_pct = max(0.0, min(100.0, (current_moisture_pct - self._wp) / self._range * 100.0))
+        status = self._status_names[bisect_right(self._status_cut, paw_pct)]
         
         irrigation_config = self.config['irrigation']
         threshold = irrigation_config['threshold_paw_percentage']
-        irrigation_needed = paw_pct < threshold and self._can_irrigate(zone_id, irrigation_config)
+        irrigation_needed = paw_pct < threshold and self._can_irrigate(zone_id)
         
         recommended_amount = irrigation_config['application_rate_mm'] if irrigation_needed else 0
         
         return {
             'current_moisture_pct': current_moisture_pct,
             'paw_percentage': paw_pct,
-            'field_capacity': field_capacity,
-            'wilting_point': wilting_point,
+            'field_capacity': self._fc,
+            'wilting_point': self._wp,
             'status': status,
             'irrigation_needed': irrigation_needed,
             'recommended_amount_mm': recommended_amount
         }
     
-    def _can_irrigate(self, zone_id, irrigation_config):
-        if zone_id not in self.last_irrigation:
-            self.last_irrigation[zone_id] = datetime.now(timezone.utc)
-            return True
-        
-        min_interval = timedelta(hours=irrigation_config['min_interval_hours'])
-        time_since_last = datetime.now(timezone.utc) - self.last_irrigation[zone_id]
+    def _can_irrigate(self, zone_id):
+        now = time.monotonic()
+        last = self.last_irrigation.get(zone_id)
         
-        can_irrigate = time_since_last >= min_interval
+        can_irrigate = last is None or now - last >= self._min_interval_sec
         
         if can_irrigate:
-            self.last_irrigation[zone_id] = datetime.now(timezone.utc)
+            self.last_irrigation[zone_id] = now
         
         return can_irrigate
@@ -3,15 +3,58 @@ Water Pump Simulator
 Simulates water pump activation and soil moisture changes
 """
 
-from typing import Dict, Optional
-from datetime import datetime
+import time
+from functools import lru_cache
+from typing import Callable, Dict
+from datetime import datetime, timezone
 from loguru import logger
-import json
+import numpy as np
+
+# Soil absorption coefficients (simplified)
+_ABSORPTION_RATES = {
+    'sand': 0.3,    # Low water retention
+    'loam': 0.5,    # Medium retention
+    'clay': 0.7     # High retention
+}
+
+
+@lru_cache(maxsize=None)
+def make_moisture_fn(soil_type: str) -> Callable[[float, float], float]:
+    """Build new_moisture(current_moisture, water_mm) with the soil's absorption folded in"""
+    # 10mm of water ≈ 5% moisture increase × absorption, i.e. one multiply per call
+    k = 0.5 * _ABSORPTION_RATES.get(soil_type, 0.5)
+    
+    def new_moisture(current_moisture: float, water_mm: float) -> float:
+        return min(current_moisture + water_mm * k, 100.0)
+    
+    return new_moisture
+
+
+# (epoch milliseconds, ISO string) of the last formatted timestamp; replaced as one
+# tuple so concurrent readers never see a mismatched pair
+_iso_cache = (0, '')
+
+
+def _iso_now() -> str:
+    """Current UTC time as ISO 8601 (millisecond precision), formatted at most once per ms"""
+    global _iso_cache
+    ns = time.time_ns()
+    ms = ns // 1_000_000
+    cached_ms, cached_iso = _iso_cache
+    if ms == cached_ms:
+        return cached_iso
+    
+    iso = datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat(timespec='milliseconds')
+    _iso_cache = (ms, iso)
+    return iso
 
 
 class WaterPumpSimulator:
     """Simulates water pump and soil moisture dynamics"""
     
+    __slots__ = ('pump_flow_rate_lpm', 'area_sqm', 'is_running', 'total_water_dispensed_liters',
+                 '_zone_index', '_moisture', '_soil_absorp')
+    
     def __init__(self, pump_flow_rate_lpm: float = 20.0, area_sqm: float = 100.0):
         """
         Initialize Water Pump Simulator
@@ -25,6 +68,11 @@ class WaterPumpSimulator:
         self.is_running = False
         self.total_water_dispensed_liters = 0.0
         
+        # Per-zone state for activate_batch (struct of arrays, indexed by register_zone)
+        self._zone_index: Dict[str, int] = {}
+        self._moisture = np.empty(0, dtype=np.float64)
+        self._soil_absorp = np.empty(0, dtype=np.float64)
+        
         logger.info(f"💧 Water Pump initialized: {pump_flow_rate_lpm}L/min, Area: {area_sqm}m²")
     
     def activate(self, amount_mm: float, zone_id: str) -> Dict:
@@ -82,26 +130,72 @@ class WaterPumpSimulator:
         Returns:
             New moisture percentage
         """
-        # Soil absorption coefficients (simplified)
-        absorption_rates = {
-            'sand': 0.3,    # Low water retention
-            'loam': 0.5,    # Medium retention
-            'clay': 0.7     # High retention
-        }
+        # Simplified: 10mm of water ≈ 5% moisture increase for loam (capped at 100%)
+        new_moisture = make_moisture_fn(soil_type)(current_moisture, water_mm)
         
-        absorption = absorption_rates.get(soil_type, 0.5)
+        logger.debug("💦 Moisture change: {:.1f}% → {:.1f}% (from {}mm)",
+                     current_moisture, new_moisture, water_mm)
         
-        # Calculate moisture increase
-        # Simplified: 10mm of water ≈ 5% moisture increase for loam
-        moisture_increase = (water_mm / 10) * 5 * absorption
+        return round(new_moisture, 2)
+    
+    def register_zone(self, zone_id: str, soil_type: str = "loam", moisture: float = 0.0) -> int:
+        """
+        Add a zone to the batched state (or reset its soil type and moisture)
         
-        # Calculate new moisture (capped at 100%)
-        new_moisture = min(current_moisture + moisture_increase, 100.0)
+        Returns:
+            Zone index for activate_batch
+        """
+        absorption = _ABSORPTION_RATES.get(soil_type, 0.5)
+        idx = self._zone_index.get(zone_id)
         
-        logger.debug(f"💦 Moisture change: {current_moisture:.1f}% → {new_moisture:.1f}% "
-                    f"(+{moisture_increase:.1f}% from {water_mm}mm)")
+        if idx is None:
+            idx = self._zone_index[zone_id] = len(self._moisture)
+            self._moisture = np.append(self._moisture, moisture)
+            self._soil_absorp = np.append(self._soil_absorp, absorption)
+        else:
+            self._moisture[idx] = moisture
+            self._soil_absorp[idx] = absorption
         
-        return round(new_moisture, 2)
+        return idx
+    
+    def activate_batch(self, amount_mm, zone_idx) -> Dict:
+        """
+        Irrigate several registered zones in one vectorized step
+        (activate + calculate_moisture_increase for each zone)
+        
+        Args:
+            amount_mm: Water amounts in millimeters, one per entry
+            zone_idx: Zone indices from register_zone, aligned with amount_mm
+            
+        Returns:
+            Dictionary of per-entry arrays (success, volume_liters, duration_minutes,
+            moisture after the batch) plus total_dispensed_liters
+        """
+        amount_mm = np.asarray(amount_mm, dtype=np.float64)
+        zone_idx = np.asarray(zone_idx, dtype=np.intp)
+        
+        # Non-positive amounts are rejected, as in activate()
+        success = amount_mm > 0
+        volume_liters = np.where(success, amount_mm * self.area_sqm, 0.0)
+        duration_minutes = volume_liters / self.pump_flow_rate_lpm
+        self.total_water_dispensed_liters += float(volume_liters.sum())
+        
+        # 10mm of water ≈ 5% moisture increase scaled by absorption, capped at 100%
+        # (add.at so a zone listed twice gets both increases)
+        increase = np.where(success, (amount_mm * 0.5) * self._soil_absorp[zone_idx], 0.0)
+        np.add.at(self._moisture, zone_idx, increase)
+        moisture = np.minimum(self._moisture[zone_idx], 100.0)
+        np.put(self._moisture, zone_idx, moisture)
+        
+        logger.info(f"🚿 PUMP BATCH: {int(success.sum())}/{len(amount_mm)} zone(s), {volume_liters.sum():.1f}L")
+        
+        return {
+            'success': success,
+            'volume_liters': volume_liters,
+            'duration_minutes': duration_minutes,
+            'moisture': moisture,
+            'total_dispensed_liters': round(self.total_water_dispensed_liters, 2)
+        }
     
     def _create_result(self, success: bool, volume_liters: float, 
                       duration_minutes: float, zone_id: str, status: str) -> Dict:
@@ -111,7 +205,7 @@ class WaterPumpSimulator:
             'zone_id': zone_id,
             'volume_liters': round(volume_liters, 2),
             'duration_minutes': round(duration_minutes, 2),
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': _iso_now(),
             'status': status,
             'total_dispensed_liters': round(self.total_water_dispensed_liters, 2)
         }
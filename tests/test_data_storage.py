@@ -0,0 +1,78 @@
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+
+from data_storage import DatabaseManager, NPKReading, SensorReading, SoilAnalysis
+
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager('sqlite:///:memory:')
+    manager.create_tables()
+    yield manager
+    manager.close()
+
+
+def test_latest_reading_is_cached(db):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    db.store_sensor_reading(t0, 'zone_a', 'moisture', 30.0, '%')
+
+    first = db.get_latest_reading('zone_a', 'moisture')
+    assert first.value == 30.0
+    assert db.get_latest_reading('zone_a', 'moisture') is first
+
+
+def test_store_invalidates_latest_reading(db):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    db.store_sensor_reading(t0, 'zone_a', 'moisture', 30.0, '%')
+    db.store_sensor_reading(t0, 'zone_a', 'temperature', 21.0, '°C')
+    assert db.get_latest_reading('zone_a', 'moisture').value == 30.0
+    assert db.get_latest_reading('zone_a', 'temperature').value == 21.0
+
+    db.store_sensor_reading(t0 + timedelta(minutes=1), 'zone_a', 'moisture', 42.0, '%')
+
+    assert db.get_latest_reading('zone_a', 'moisture').value == 42.0
+    # Other sensor types for the zone keep their cached row
+    assert ('zone_a', 'temperature') in db._qcache
+
+
+def test_duplicate_readings_are_ignored(db):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    db.store_sensor_reading(t0, 'zone_a', 'moisture', 30.0, '%')
+    db.store_sensor_reading(t0, 'zone_a', 'moisture', 30.0, '%')
+
+    assert db.get_latest_reading('zone_a', 'moisture').value == 30.0
+    with db.get_session() as session:
+        assert session.query(SensorReading).count() == 1
+
+
+def test_soil_analyses_bulk_returns_ids_in_input_order(db):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    rows = [
+        {'timestamp': t0, 'zone_id': f'zone_{i}', 'paw_percentage': 10.0 * i,
+         'irrigation_needed': i % 2 == 0, 'current_moisture': 20.0 + i}
+        for i in range(5)
+    ]
+
+    ids = db.store_soil_analyses_bulk(rows)
+
+    assert len(ids) == len(rows)
+    with db.get_session() as session:
+        stored = {a.id: a.zone_id for a in session.query(SoilAnalysis)}
+    assert [stored[i] for i in ids] == [row['zone_id'] for row in rows]
+
+
+def test_npk_status_matches_sql_with_missing_nutrients(db):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    # Each nutrient below, between and above its thresholds, or missing
+    combos = list(itertools.product((None, 30.0, 60.0, 90.0), (None, 20.0, 30.0, 50.0), (None, 90.0, 120.0, 200.0)))
+    for i, (n, p, k) in enumerate(combos):
+        db.store_npk_reading(t0 + timedelta(seconds=i), f'zone_{i}', n, p, k)
+
+    with db.get_session() as session:
+        rows = session.query(NPKReading, NPKReading.status).all()
+
+    assert len(rows) == len(combos)
+    for reading, sql_status in rows:
+        assert reading.status == sql_status, reading
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from data_storage import DatabaseManager
+from irrigation_job import IrrigationJob
+
+
+class FakeMQTT:
+    """Records (topic, payload) for every publish"""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append((topic, orjson.loads(payload)))
+        return SimpleNamespace(rc=0)
+
+    def topics(self):
+        return [topic for topic, _ in self.published]
+
+
+@pytest.fixture
+def db(tmp_path):
+    # File-backed: in-memory sqlite gives each zone worker its own empty database
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'irrigation.db'}")
+    manager.create_tables()
+    yield manager
+    manager.close()
+
+
+def _job(db, **kwargs):
+    mqtt = FakeMQTT()
+    return IrrigationJob(db, mqtt, use_mock_model=True, **kwargs), mqtt
+
+
+def _seed_dry_zone(db, zone_id='zone-1'):
+    now = datetime.now(timezone.utc)
+    db.store_sensor_reading(now - timedelta(minutes=5), zone_id, 'moisture', 15.0, '%')
+    db.store_sensor_reading(now - timedelta(minutes=5), zone_id, 'temperature', 32.0, '°C')
+
+
+def test_lifecycle_events_keep_their_place_in_the_stream(db):
+    _seed_dry_zone(db)
+    job, mqtt = _job(db)
+
+    job.execute()
+
+    topics = mqtt.topics()
+    order = [
+        'irrigation/job/execution_started',
+        'irrigation/job/zones_evaluation',
+        'irrigation/zones/zone-1/metrics_gathered',
+        'irrigation/zones/zone-1/ml_decision',
+        'irrigation/events/zone-1/irrigation_started',
+        'actuators/pump/command',
+        'irrigation/events/zone-1/irrigation_completed',
+        'irrigation/job/execution_completed',
+        'irrigation/job/summary',
+    ]
+    assert [t for t in topics if t in order] == order
+
+
+def test_lifecycle_events_go_out_without_granular_events(db):
+    _seed_dry_zone(db)
+    job, mqtt = _job(db, granular_events=False)
+
+    job.execute()
+
+    assert [t for t in mqtt.topics() if t.startswith('irrigation/')] == [
+        'irrigation/events/zone-1/irrigation_started',
+        'irrigation/events/zone-1/irrigation_completed',
+        'irrigation/job/summary',
+    ]
+
+
+def test_execute_after_stop_rebuilds_the_zone_pool(db):
+    _seed_dry_zone(db)
+    job, mqtt = _job(db)
+    job.start()
+    job.stop()
+
+    job.execute()
+
+    assert 'irrigation/events/zone-1/irrigation_completed' in mqtt.topics()
+
+
+def test_gather_metrics_uses_the_latest_reading_per_zone(db):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    # Newest rows first so insertion order can't stand in for timestamp order
+    db.store_sensor_reading(t0 + timedelta(hours=1), 'zone-1', 'moisture', 20.0, '%')
+    db.store_sensor_reading(t0, 'zone-1', 'moisture', 22.0, '%')
+    db.store_sensor_reading(t0, 'zone-2', 'moisture', 35.0, '%')
+    db.store_sensor_reading(t0 + timedelta(hours=2), 'zone-2', 'moisture', 31.0, '%')
+    db.store_humidity_reading(t0 + timedelta(hours=1), 'zone-1', 55.0)
+    db.store_humidity_reading(t0, 'zone-1', 70.0)
+    db.store_npk_reading(t0 + timedelta(hours=1), 'zone-1', 30.0, 30.0, 120.0)
+    db.store_npk_reading(t0, 'zone-1', 90.0, 50.0, 200.0)
+    job, _ = _job(db)
+
+    metrics = job._gather_metrics_bulk(['zone-1', 'zone-2'], t0)
+
+    assert metrics['zone-1']['moisture_percent'] == 20.0
+    assert metrics['zone-1']['humidity_percent'] == 55.0
+    assert metrics['zone-1']['nitrogen_mgkg'] == 30.0
+    assert metrics['zone-1']['npk_status'] == 'LOW'
+    assert metrics['zone-2']['moisture_percent'] == 31.0
+    assert job._gather_metrics('zone-1', t0)['moisture_percent'] == 20.0
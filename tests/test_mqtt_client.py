@@ -0,0 +1,112 @@
+import queue
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+
+import orjson
+import paho.mqtt.client as mqtt
+import pytest
+
+from data_storage import DatabaseManager, SensorReading
+from mqtt_client import SensorDataCollector
+
+
+@pytest.fixture
+def collector(tmp_path):
+    # File-backed: in-memory sqlite gives each thread its own empty database
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'sensors.db'}")
+    db.create_tables()
+    yield SensorDataCollector(broker='localhost', port=1883, topics={'moisture': 'sensors/soil/moisture'},
+                              db_manager=db)
+    db.close()
+
+
+@pytest.fixture
+def connect(collector, monkeypatch):
+    """Run collector.connect() without a broker; returns the on_message paho would call"""
+    for name in ('connect', 'loop_start', 'loop_stop', 'disconnect'):
+        monkeypatch.setattr(mqtt.Client, name, lambda self, *args, **kwargs: mqtt.MQTT_ERR_SUCCESS)
+
+    def _connect():
+        collector.connect()
+        return collector.client.on_message
+    return _connect
+
+
+def _msg(topic, **payload):
+    payload.setdefault('timestamp', '2024-05-01T12:00:00Z')
+    return SimpleNamespace(topic=topic, payload=orjson.dumps(payload))
+
+
+def _stored(db):
+    with db.get_session() as session:
+        return sorted((r.zone_id, r.value) for r in session.query(SensorReading))
+
+
+def test_parse_rejects_rows_missing_required_fields(collector):
+    assert collector._parse_message(_msg('sensors/soil/moisture', zone_id='zone-1', unit='%')) is None
+    assert collector._parse_message(_msg('sensors/soil/moisture', value=30.0, unit='%')) is None
+
+    row = collector._parse_message(_msg('sensors/soil/moisture', zone_id='zone-1', value=30.0, unit='%'))
+    assert row['sensor_type'] == 'moisture'
+    assert row['timestamp'].utcoffset().total_seconds() == 0
+
+
+def test_failed_batch_falls_back_to_per_row_inserts(collector):
+    t0 = datetime(2024, 5, 1, 12, 0, 0)
+    rows = [
+        {'timestamp': t0, 'zone_id': f'zone-{i}', 'sensor_type': 'moisture', 'value': 30.0 + i,
+         'unit': '%', 'depth_cm': None}
+        for i in range(5)
+    ]
+    # A value the driver cannot bind fails the multi-row INSERT as a whole
+    rows[2]['value'] = {'not': 'a number'}
+
+    collector._flush_rows(rows)
+
+    assert rows == []
+    assert _stored(collector.db) == [('zone-0', 30.0), ('zone-1', 31.0), ('zone-3', 33.0), ('zone-4', 34.0)]
+
+
+def test_full_inbox_drops_instead_of_blocking(collector, connect):
+    busy, release = threading.Event(), threading.Event()
+
+    def handler(client, userdata, msg):
+        busy.set()
+        release.wait(5)
+
+    collector.custom_callback = handler
+    collector._inbox = queue.Queue(maxsize=1)
+    on_message = connect()
+
+    # The first message occupies the consumer, the second fills the inbox
+    on_message(None, None, _msg('sensors/soil/moisture', zone_id='zone-1', value=30.0, unit='%'))
+    assert busy.wait(5)
+    on_message(None, None, _msg('sensors/soil/moisture', zone_id='zone-1', value=31.0, unit='%'))
+    on_message(None, None, _msg('sensors/soil/moisture', zone_id='zone-1', value=32.0, unit='%'))
+
+    assert collector._inbox.qsize() == 1
+    assert collector.dropped_messages == 1
+    release.set()
+    collector.stop()
+
+
+def test_custom_callback_runs_on_consumer_thread_and_batches(collector, connect):
+    seen_threads = set()
+
+    def handler(client, userdata, msg):
+        seen_threads.add(threading.current_thread().name)
+        payload = orjson.loads(msg.payload)
+        collector.buffer_reading(datetime(2024, 5, 1, 12, 0, 0), payload['zone_id'], 'moisture',
+                                 payload.get('value'), payload['unit'])
+
+    collector.custom_callback = handler
+    on_message = connect()
+    for i in range(3):
+        on_message(None, None, _msg('sensors/soil/moisture', zone_id=f'zone-{i}', value=30.0 + i, unit='%'))
+    # Missing value: dropped by buffer_reading instead of failing the batch
+    on_message(None, None, _msg('sensors/soil/moisture', zone_id='zone-9', unit='%'))
+    collector.stop()
+
+    assert seen_threads == {'mqtt-consumer'}
+    assert _stored(collector.db) == [('zone-0', 30.0), ('zone-1', 31.0), ('zone-2', 32.0)]
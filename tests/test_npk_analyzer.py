@@ -0,0 +1,75 @@
+import itertools
+import os
+
+import pytest
+
+from npk_analyzer import NPKAnalyzer
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'npk_config.yaml')
+CROPS = ['wheat', 'corn', 'tomato', 'unknown-crop']
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return NPKAnalyzer(CONFIG_PATH)
+
+
+def _reference_status(thresholds, value):
+    """The if-chain analyze_nutrient used before it was table driven"""
+    if value < thresholds.get('critical_low', 0):
+        return 'CRITICAL'
+    if value < thresholds.get('low', 0):
+        return 'LOW'
+    if value < thresholds.get('optimal_min', 0):
+        return 'DEFICIENT'
+    if value <= thresholds.get('optimal_max', 999):
+        return 'OPTIMAL'
+    return 'EXCESS'
+
+
+def _boundary_values(analyzer, nutrient, symbol):
+    """Every threshold and crop minimum for a nutrient, plus values just either side"""
+    thresholds = analyzer.config['npk_thresholds'][nutrient]
+    points = [thresholds[k] for k in ('critical_low', 'low', 'optimal_min', 'optimal_max')]
+    points += [req[symbol]['min'] for req in analyzer.config['crop_requirements'].values()]
+    return sorted({p + d for p in points for d in (-0.1, 0, 0.1)} | {0})
+
+
+def test_statuses_match_reference_at_boundaries(analyzer):
+    for nutrient, symbol in (('nitrogen', 'N'), ('phosphorus', 'P'), ('potassium', 'K')):
+        thresholds = analyzer.config['npk_thresholds'][nutrient]
+        for value in _boundary_values(analyzer, nutrient, symbol):
+            assert analyzer.analyze_nutrient(nutrient, value)['status'] == _reference_status(thresholds, value), value
+
+
+def test_batch_matches_per_zone_analysis(analyzer):
+    n_values = _boundary_values(analyzer, 'nitrogen', 'N')
+    p_values = _boundary_values(analyzer, 'phosphorus', 'P')
+    k_values = _boundary_values(analyzer, 'potassium', 'K')
+
+    # Walk every boundary of every nutrient while cycling the others and the crop
+    size = max(len(n_values), len(p_values), len(k_values)) * len(CROPS)
+
+    def cycle(values):
+        return list(itertools.islice(itertools.cycle(values), size))
+
+    nitrogen, phosphorus, potassium, crops = cycle(n_values), cycle(p_values[::-1]), cycle(k_values), cycle(CROPS)
+    zone_ids = [f'zone-{i}' for i in range(size)]
+
+    batch = analyzer.analyze_npk_batch(zone_ids, nitrogen, phosphorus, potassium, crops)
+
+    assert len(batch) == size
+    for i, result in enumerate(batch):
+        expected = analyzer.analyze_npk(zone_ids[i], nitrogen[i], phosphorus[i], potassium[i], crop_type=crops[i])
+        assert result == expected, (nitrogen[i], phosphorus[i], potassium[i], crops[i])
+
+
+def test_recommendations_only_for_deficient_nutrients(analyzer):
+    result = analyzer.analyze_npk('zone-1', nitrogen=30, phosphorus=45, potassium=400, crop_type='wheat')
+
+    assert result['nitrogen']['status'] == 'LOW'
+    assert result['potassium']['status'] == 'EXCESS'
+    assert result['overall_status'] == 'DEFICIENT'
+    assert [rec['nutrient'] for rec in result['recommendations']] == ['N']
+    # (80 - 30) mg/kg deficit / 20 * 50 kg/ha
+    assert result['recommendations'][0]['amount_kg_per_ha'] == 125.0
@@ -0,0 +1,142 @@
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ml.pump_rules import calculate_amount, generate_reason
+from pump_model_client import MockMLModelService, PumpModelClient
+
+
+def _zones():
+    """Random readings plus the values where the mock model's terms switch on or clip"""
+    rng = np.random.default_rng(42)
+    n = 500
+    moisture = np.concatenate([rng.uniform(0, 100, n), [0, 25, 25.05, 40, 50, 100]])
+    temperature = np.concatenate([rng.uniform(-5, 45, n), [25, 25.04, 25.05, 30, -5, 45]])
+    humidity = np.concatenate([rng.uniform(0, 100, n), [0, 40, 60, 100, 50, 50]])
+    rainfall = np.concatenate([rng.uniform(0, 15, n), [0, 2, 9.95, 10, 10.05, 15]])
+    npk_low = np.concatenate([rng.random(n) < 0.5, [True, False, True, False, True, False]])
+    return moisture, temperature, humidity, rainfall, npk_low
+
+
+def test_score_batch_matches_predict():
+    moisture, temperature, humidity, rainfall, npk_low = _zones()
+
+    should_irrigate, confidence, amount_mm, irrigation_score = MockMLModelService.score_batch(
+        moisture, temperature, humidity, rainfall, npk_low
+    )
+
+    assert len(should_irrigate) == len(moisture)
+    for i in range(len(moisture)):
+        decision = MockMLModelService.predict({
+            'moisture_percent': float(moisture[i]),
+            'temperature_celsius': float(temperature[i]),
+            'humidity_percent': float(humidity[i]),
+            'rainfall_mm_24h': float(rainfall[i]),
+            'npk_status': 'LOW' if npk_low[i] else 'OPTIMAL',
+        })
+        assert bool(should_irrigate[i]) == decision['should_irrigate'], i
+        assert round(float(confidence[i]), 3) == decision['confidence'], i
+        assert round(float(amount_mm[i]), 2) == decision['recommended_amount_mm'], i
+        assert round(float(irrigation_score[i]), 3) == decision['irrigation_score'], i
+
+
+def test_predict_reduces_amount_when_nutrients_low():
+    metrics = {'moisture_percent': 20.0, 'temperature_celsius': 32.0, 'humidity_percent': 35.0,
+               'rainfall_mm_24h': 0.0}
+
+    optimal = MockMLModelService.predict({**metrics, 'npk_status': 'OPTIMAL'})
+    low = MockMLModelService.predict({**metrics, 'npk_status': 'LOW'})
+
+    assert optimal['should_irrigate'] and low['should_irrigate']
+    assert low['recommended_amount_mm'] == round(optimal['recommended_amount_mm'] * 0.8, 2)
+
+
+def _float_reference(moisture, temperature, humidity, rainfall, npk_low):
+    """The mock model as originally written in float arithmetic"""
+    moisture_score = (100 - moisture) / 100
+    score = (moisture_score * 0.4 + max(0, (temperature - 25) / 20) * 0.2 +
+             (100 - humidity) / 100 * 0.2 + max(0, (10 - rainfall) / 10) * 0.2)
+    amount = 10 * (1 + moisture_score) * (0.8 if npk_low else 1.0) if score > 0.5 else 0.0
+    return score > 0.5, round(min(score, 1.0), 3), round(amount, 2)
+
+
+def test_predict_keeps_float_precision_below_tenths():
+    rng = np.random.default_rng(7)
+    for _ in range(2000):
+        moisture, temperature, humidity, rainfall = (
+            round(float(x), 2) for x in (rng.uniform(0, 100), rng.uniform(-5, 45), rng.uniform(0, 100), rng.uniform(0, 15))
+        )
+        npk_low = bool(rng.random() < 0.5)
+        decision = MockMLModelService.predict({
+            'moisture_percent': moisture, 'temperature_celsius': temperature, 'humidity_percent': humidity,
+            'rainfall_mm_24h': rainfall, 'npk_status': 'LOW' if npk_low else 'OPTIMAL',
+        })
+
+        expected = _float_reference(moisture, temperature, humidity, rainfall, npk_low)
+        assert (decision['should_irrigate'], decision['confidence'], decision['recommended_amount_mm']) == expected
+
+
+class StubSession:
+    """Stands in for onnxruntime.InferenceSession: records inputs, returns canned probabilities"""
+
+    def __init__(self, model_path, providers=None):
+        self.inputs = []
+        self.probabilities = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name='float_input')]
+
+    def run(self, output_names, feeds):
+        features = feeds['float_input']
+        self.inputs.append(features.copy())
+        rows = self.probabilities[:len(features)]
+        return [np.array([int(p[1] > 0.5) for p in rows]), rows]
+
+
+@pytest.fixture
+def onnx_client(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'onnxruntime', SimpleNamespace(InferenceSession=StubSession))
+    return PumpModelClient('unused', backend='onnx', model_path='pump.onnx')
+
+
+def test_onnx_predict_feeds_features_in_training_order(onnx_client):
+    session = onnx_client._session_ort
+    session.probabilities = [np.array([0.1, 0.9], dtype=np.float32)]
+    metrics = {'temperature_celsius': 33.0, 'humidity_percent': 35.0, 'moisture_percent': 22.0,
+               'nitrogen_mgkg': 30.0, 'phosphorus_mgkg': 20.0, 'potassium_mgkg': 90.0}
+
+    decision = onnx_client.predict_irrigation(metrics)
+
+    features = session.inputs[0]
+    assert features.dtype == np.float32 and features.shape == (1, 6)
+    assert features[0].tolist() == [33.0, 35.0, 22.0, 30.0, 20.0, 90.0]
+
+    probability = float(np.float32(0.9))
+    assert decision['should_irrigate'] is True
+    assert decision['probability'] == round(probability, 3)
+    assert decision['confidence'] == round(abs(probability - 0.5) * 2, 3)
+    assert decision['recommended_amount_mm'] == round(calculate_amount(probability, 22.0, 33.0, 35.0), 2)
+    assert decision['reason'] == generate_reason(True, probability, 22.0, 33.0, 35.0, 30.0, 20.0, 90.0,
+                                                 model_name="ONNX")
+    assert decision['reason'].startswith("ONNX model recommends irrigation")
+
+
+def test_onnx_batch_uses_defaults_and_class_one_of_probability_maps(onnx_client):
+    session = onnx_client._session_ort
+    # ZipMap-style exports return {class: probability} per row
+    session.probabilities = [{0: 0.8, 1: 0.2}, {0: 0.3, 1: 0.7}]
+
+    decisions = onnx_client.predict_irrigation_batch([
+        {},
+        {'Temperature': 28.0, 'Humidity': 50.0, 'water_level': 45.0, 'N': 60.0, 'P': 35.0, 'K': 160.0},
+    ])
+
+    assert session.inputs[0].tolist() == [[25.0, 60.0, 50.0, 50.0, 30.0, 150.0],
+                                          [28.0, 50.0, 45.0, 60.0, 35.0, 160.0]]
+    assert [d['should_irrigate'] for d in decisions] == [False, True]
+    assert decisions[0]['recommended_amount_mm'] == 0.0
+    assert decisions[0]['reason'] == generate_reason(False, 0.2, 50.0, 25.0, 60.0, 50.0, 30.0, 150.0,
+                                                    model_name="ONNX")
+    assert decisions[1]['recommended_amount_mm'] == round(calculate_amount(0.7, 45.0, 28.0, 50.0), 2)
@@ -0,0 +1,71 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from water_pump_simulator import WaterPumpSimulator, _iso_now, make_moisture_fn
+
+
+@pytest.fixture
+def pump():
+    return WaterPumpSimulator(pump_flow_rate_lpm=20.0, area_sqm=100.0)
+
+
+def test_make_moisture_fn_is_cached_per_soil_type():
+    assert make_moisture_fn('clay') is make_moisture_fn('clay')
+    assert make_moisture_fn('sand')(30.0, 10.0) == pytest.approx(31.5)
+    assert make_moisture_fn('clay')(30.0, 10.0) == pytest.approx(33.5)
+    # Unknown soils fall back to loam's absorption; the result is capped at 100%
+    assert make_moisture_fn('peat')(30.0, 10.0) == pytest.approx(32.5)
+    assert make_moisture_fn('clay')(99.0, 20.0) == 100.0
+
+
+def test_register_zone_keeps_indices_and_resets_state(pump):
+    assert pump.register_zone('zone-a', 'sand', 20.0) == 0
+    assert pump.register_zone('zone-b', 'clay', 30.0) == 1
+
+    assert pump.register_zone('zone-a', 'clay', 45.0) == 0
+    assert pump._moisture.tolist() == [45.0, 30.0]
+    assert pump._soil_absorp.tolist() == [0.7, 0.7]
+
+
+def test_activate_batch_matches_activate_per_zone(pump):
+    soils = {'zone-a': 'sand', 'zone-b': 'loam', 'zone-c': 'clay', 'zone-d': 'loam'}
+    moisture = {'zone-a': 20.0, 'zone-b': 35.0, 'zone-c': 90.0, 'zone-d': 50.0}
+    idx = [pump.register_zone(z, soils[z], moisture[z]) for z in soils]
+    # zone-c overflows the 100% cap, zone-d is rejected
+    amounts = [12.0, 8.5, 25.0, 0.0]
+
+    batch = pump.activate_batch(amounts, idx)
+
+    single = WaterPumpSimulator(pump_flow_rate_lpm=20.0, area_sqm=100.0)
+    for i, zone_id in enumerate(soils):
+        result = single.activate(amounts[i], zone_id)
+        assert bool(batch['success'][i]) == result['success']
+        assert round(float(batch['volume_liters'][i]), 2) == result['volume_liters']
+        assert round(float(batch['duration_minutes'][i]), 2) == result['duration_minutes']
+        expected = (single.calculate_moisture_increase(moisture[zone_id], amounts[i], soils[zone_id])
+                    if result['success'] else moisture[zone_id])
+        assert round(float(batch['moisture'][i]), 2) == expected
+    assert batch['total_dispensed_liters'] == single.get_status()['total_dispensed_liters']
+
+
+def test_activate_batch_applies_repeated_zones_cumulatively(pump):
+    zone = pump.register_zone('zone-a', 'loam', 40.0)
+
+    batch = pump.activate_batch([10.0, 10.0], [zone, zone])
+
+    assert pump._moisture[zone] == pytest.approx(45.0)
+    assert batch['moisture'].tolist() == pytest.approx([45.0, 45.0])
+    assert batch['total_dispensed_liters'] == 2000.0
+
+
+def test_result_timestamp_is_utc_with_millisecond_precision(pump):
+    before = datetime.now(timezone.utc)
+    timestamp = pump.activate(5.0, 'zone-a')['timestamp']
+
+    assert re.fullmatch(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}\+00:00', timestamp)
+    parsed = datetime.fromisoformat(timestamp)
+    assert before - timedelta(milliseconds=1) <= parsed <= datetime.now(timezone.utc)
+    assert _iso_now() >= timestamp